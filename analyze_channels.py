@@ -8,29 +8,144 @@ from pathlib import Path
 plt.style.use('default')  # Using default style instead of seaborn
 sns.set_theme()  # This will set up seaborn's default styling
 
+# Columns used by the analysis and plots, with their on-disk integer widths
+USECOLS = ['channel_id', 'capacity', 'node1_balance', 'node2_balance',
+           'node1_tx_rate', 'node2_tx_rate', 'fee_rate_ppm', 'age_days']
+DTYPES = {col: np.int32 for col in USECOLS if col != 'channel_id'}
+
+# Rows per chunk when streaming the CSV, and rows kept for quantiles/scatter plots
+CHUNKSIZE = 1_000_000
+SAMPLE_SIZE = 100_000
+HIST_BINS = 50
+STAT_COLUMNS = ['capacity', 'utilization', 'balance_imbalance', 'fee_rate_ppm']
+
+def add_metrics(df):
+    """Add the derived per-channel metrics to a frame of raw channel rows."""
+    # Calculate additional metrics on the raw arrays; the reciprocal of the
+    # capacity is shared by both ratio columns
+    n1 = df['node1_balance'].to_numpy()
+    n2 = df['node2_balance'].to_numpy()
+    inv_cap = np.reciprocal(df['capacity'].to_numpy(), dtype=np.float64)
+    df['utilization'] = (n1 + n2) * inv_cap
+    df['balance_imbalance'] = np.abs(n1 - n2) * inv_cap
+    df['total_tx_rate'] = df['node1_tx_rate'].to_numpy() + df['node2_tx_rate'].to_numpy()
+    
+    return df
+
 def load_data(file_path):
     """Load and preprocess the payment channel data."""
-    df = pd.read_csv(file_path)
+    df = pd.read_csv(file_path, usecols=USECOLS, dtype=DTYPES, engine='c')
+    return add_metrics(df)
+
+def iter_chunks(file_path, chunksize=CHUNKSIZE):
+    """Stream the payment channel data as preprocessed chunks."""
+    reader = pd.read_csv(file_path, usecols=USECOLS, dtype=DTYPES, engine='c',
+                         chunksize=chunksize)
+    for chunk in reader:
+        yield add_metrics(chunk)
+
+def scan_channels(file_path, chunksize=CHUNKSIZE, sample_size=SAMPLE_SIZE, seed=0):
+    """
+    First pass over the data: accumulate count, sums, min and max of the
+    summary columns and keep a uniform reservoir sample of rows.
     
-    # Calculate additional metrics
-    df['utilization'] = (df['node1_balance'] + df['node2_balance']) / df['capacity']
-    df['balance_imbalance'] = abs(df['node1_balance'] - df['node2_balance']) / df['capacity']
-    df['total_tx_rate'] = df['node1_tx_rate'] + df['node2_tx_rate']
+    The sample holds every row when the file has at most `sample_size` rows,
+    in which case quantiles taken from it are exact.
+    """
+    rng = np.random.default_rng(seed)
+    count = 0
+    sums = pd.Series(0.0, index=STAT_COLUMNS)
+    mins = pd.Series(np.inf, index=STAT_COLUMNS)
+    maxs = pd.Series(-np.inf, index=STAT_COLUMNS)
+    sample = None
+    for chunk in iter_chunks(file_path, chunksize):
+        count += len(chunk)
+        stats = chunk[STAT_COLUMNS].agg(['sum', 'min', 'max'])
+        sums += stats.loc['sum']
+        mins = np.minimum(mins, stats.loc['min'])
+        maxs = np.maximum(maxs, stats.loc['max'])
+        
+        # Reservoir: keep the rows with the smallest random keys seen so far
+        chunk = chunk.assign(_key=rng.random(len(chunk)))
+        sample = chunk if sample is None else pd.concat([sample, chunk], ignore_index=True)
+        if len(sample) > sample_size:
+            sample = sample.nsmallest(sample_size, '_key')
+    sample = sample.drop(columns='_key').sort_index(ignore_index=True)
     
-    return df
+    return {'count': count, 'sum': sums, 'min': mins, 'max': maxs, 'sample': sample}
+
+def analyze_channels_chunked(file_path, chunksize=CHUNKSIZE, sample_size=SAMPLE_SIZE):
+    """
+    Out-of-core version of `analyze_channels`.
+    
+    Peak memory is bounded by the chunk and sample sizes instead of the file
+    size. Returns the analysis dict, the accumulated histograms and the row
+    sample used for the scatter plots.
+    """
+    scan = scan_channels(file_path, chunksize, sample_size)
+    sample = scan['sample']
+    
+    # Age quintile edges from the sample, and fixed histogram edges from the first pass
+    age_edges = np.unique(np.percentile(sample['age_days'], np.linspace(0, 100, 6)))
+    hist_edges = {
+        col: np.linspace(scan['min'][col], scan['max'][col], HIST_BINS + 1)
+        for col in ('capacity', 'fee_rate_ppm')
+    }
+    hist_counts = {col: np.zeros(HIST_BINS, dtype=np.int64) for col in hist_edges}
+    
+    # Second pass: bin each chunk into the fixed edges and sum the partial results
+    by_age = None
+    for chunk in iter_chunks(file_path, chunksize):
+        bins = pd.cut(chunk['age_days'], bins=age_edges, include_lowest=True)
+        part = chunk.groupby(bins, observed=False).agg(
+            channels=('channel_id', 'count'),
+            capacity=('capacity', 'sum')
+        ).astype(np.int64)
+        by_age = part if by_age is None else by_age + part
+        for col, edges in hist_edges.items():
+            hist_counts[col] += np.histogram(chunk[col].to_numpy(), bins=edges)[0]
+    by_age = by_age[by_age['channels'] > 0]
+    
+    n = scan['count']
+    analysis = {
+        'total_channels': n,
+        'total_capacity': scan['sum']['capacity'],
+        'avg_capacity': scan['sum']['capacity'] / n,
+        'median_capacity': sample['capacity'].median(),
+        'avg_utilization': scan['sum']['utilization'] / n,
+        'avg_balance_imbalance': scan['sum']['balance_imbalance'] / n,
+        'avg_fee_rate': scan['sum']['fee_rate_ppm'] / n,
+        'channels_by_age': by_age['channels'].to_dict(),
+        'capacity_by_age': by_age['capacity'].to_dict()
+    }
+    histograms = {col: (hist_counts[col], hist_edges[col]) for col in hist_edges}
+    return analysis, histograms, sample
 
 def analyze_channels(df):
     """Perform analysis on the payment channel data."""
+    # Bin by age once and keep the integer bin codes as a column, so per-bin
+    # aggregations group on a small integer key instead of hashing intervals
+    bins = pd.qcut(df['age_days'], q=5)
+    df['age_bin'] = bins.cat.codes.astype(np.int8)
+    by_age = df.groupby('age_bin', observed=True).agg(
+        channels=('channel_id', 'count'),
+        capacity=('capacity', 'sum')
+    )
+    by_age.index = bins.cat.categories[by_age.index]
+
+    # Summary statistics for all columns in one aggregation
+    stats = df[['capacity', 'utilization', 'balance_imbalance', 'fee_rate_ppm']].agg(['sum', 'mean', 'median'])
+
     analysis = {
         'total_channels': len(df),
-        'total_capacity': df['capacity'].sum(),
-        'avg_capacity': df['capacity'].mean(),
-        'median_capacity': df['capacity'].median(),
-        'avg_utilization': df['utilization'].mean(),
-        'avg_balance_imbalance': df['balance_imbalance'].mean(),
-        'avg_fee_rate': df['fee_rate_ppm'].mean(),
-        'channels_by_age': df.groupby(pd.qcut(df['age_days'], q=5))['channel_id'].count().to_dict(),
-        'capacity_by_age': df.groupby(pd.qcut(df['age_days'], q=5))['capacity'].sum().to_dict()
+        'total_capacity': stats.at['sum', 'capacity'],
+        'avg_capacity': stats.at['mean', 'capacity'],
+        'median_capacity': stats.at['median', 'capacity'],
+        'avg_utilization': stats.at['mean', 'utilization'],
+        'avg_balance_imbalance': stats.at['mean', 'balance_imbalance'],
+        'avg_fee_rate': stats.at['mean', 'fee_rate_ppm'],
+        'channels_by_age': by_age['channels'].to_dict(),
+        'capacity_by_age': by_age['capacity'].to_dict()
     }
     return analysis
 
@@ -44,25 +159,68 @@ def create_visualizations(df, output_dir):
     fig.suptitle('Payment Channel Network Analysis', fontsize=16)
     
     # 1. Capacity Distribution
-    sns.histplot(data=df, x='capacity', bins=50, ax=axes[0,0])
+    axes[0,0].hist(df['capacity'].to_numpy(), bins=HIST_BINS)
+    axes[0,0].set_title('Distribution of Channel Capacities')
+    axes[0,0].set_xlabel('Capacity (sats)')
+    axes[0,0].set_ylabel('Number of Channels')
+    
+    # 2. Utilization vs Balance Imbalance
+    axes[0,1].scatter(df['utilization'].to_numpy(), df['balance_imbalance'].to_numpy(), alpha=0.5, s=4, rasterized=True)
+    axes[0,1].set_title('Channel Utilization vs Balance Imbalance')
+    axes[0,1].set_xlabel('Utilization')
+    axes[0,1].set_ylabel('Balance Imbalance')
+    
+    # 3. Fee Rate Distribution
+    axes[1,0].hist(df['fee_rate_ppm'].to_numpy(), bins=HIST_BINS)
+    axes[1,0].set_title('Distribution of Fee Rates')
+    axes[1,0].set_xlabel('Fee Rate (ppm)')
+    axes[1,0].set_ylabel('Number of Channels')
+    
+    # 4. Age vs Capacity
+    axes[1,1].scatter(df['age_days'].to_numpy(), df['capacity'].to_numpy(), alpha=0.5, s=4, rasterized=True)
+    axes[1,1].set_title('Channel Age vs Capacity')
+    axes[1,1].set_xlabel('Age (days)')
+    axes[1,1].set_ylabel('Capacity (sats)')
+    
+    # Adjust layout and save
+    plt.tight_layout()
+    plt.savefig(output_dir / 'all_plots.png', dpi=300, bbox_inches='tight')
+    plt.close()
+
+def create_summary_visualizations(histograms, sample, output_dir):
+    """
+    Create the same figure as `create_visualizations` from accumulated
+    histogram counts and a row sample instead of the full data.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+    
+    # Create a single figure with 2x2 subplots
+    fig, axes = plt.subplots(2, 2, figsize=(20, 16))
+    fig.suptitle('Payment Channel Network Analysis', fontsize=16)
+    
+    # 1. Capacity Distribution
+    counts, edges = histograms['capacity']
+    axes[0,0].hist(edges[:-1], bins=edges, weights=counts)
     axes[0,0].set_title('Distribution of Channel Capacities')
     axes[0,0].set_xlabel('Capacity (sats)')
     axes[0,0].set_ylabel('Number of Channels')
     
     # 2. Utilization vs Balance Imbalance
-    sns.scatterplot(data=df, x='utilization', y='balance_imbalance', alpha=0.5, ax=axes[0,1])
+    axes[0,1].scatter(sample['utilization'].to_numpy(), sample['balance_imbalance'].to_numpy(), alpha=0.5, s=4, rasterized=True)
     axes[0,1].set_title('Channel Utilization vs Balance Imbalance')
     axes[0,1].set_xlabel('Utilization')
     axes[0,1].set_ylabel('Balance Imbalance')
     
     # 3. Fee Rate Distribution
-    sns.histplot(data=df, x='fee_rate_ppm', bins=50, ax=axes[1,0])
+    counts, edges = histograms['fee_rate_ppm']
+    axes[1,0].hist(edges[:-1], bins=edges, weights=counts)
     axes[1,0].set_title('Distribution of Fee Rates')
     axes[1,0].set_xlabel('Fee Rate (ppm)')
     axes[1,0].set_ylabel('Number of Channels')
     
     # 4. Age vs Capacity
-    sns.scatterplot(data=df, x='age_days', y='capacity', alpha=0.5, ax=axes[1,1])
+    axes[1,1].scatter(sample['age_days'].to_numpy(), sample['capacity'].to_numpy(), alpha=0.5, s=4, rasterized=True)
     axes[1,1].set_title('Channel Age vs Capacity')
     axes[1,1].set_xlabel('Age (days)')
     axes[1,1].set_ylabel('Capacity (sats)')
@@ -95,14 +253,11 @@ def save_analysis(analysis, output_file):
             f.write(f'- {age_range}: {capacity:,.0f} sats\n')
 
 def main():
-    # Load data
-    df = load_data('DATA/pcn_network_data.csv')
-    
-    # Perform analysis
-    analysis = analyze_channels(df)
+    # Stream the data and perform analysis out of core
+    analysis, histograms, sample = analyze_channels_chunked('DATA/pcn_network_data.csv')
     
     # Create visualizations
-    create_visualizations(df, 'analysis_output')
+    create_summary_visualizations(histograms, sample, 'analysis_output')
     
     # Save analysis results
     save_analysis(analysis, 'analysis_output/analysis_results.md')
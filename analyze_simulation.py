@@ -1,24 +1,46 @@
 import h5py
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import seaborn as sns
 from pathlib import Path
 import glob
+from concurrent.futures import ThreadPoolExecutor
+
+# Result datasets used by the plots and the summary
+WANTED_RESULTS = (
+    'final_fortune',
+    'initial_fortune',
+    'success_rate_node_total',
+    'success_count_node_total',
+    'failure_count_node_total',
+    'arrived_count_node_total',
+    'balance_history_values',
+    'balance_history_times',
+    'normalized_throughput_node_total'
+)
+
+# Time series that can be large; they are loaded at full precision, so balance
+# changes are counted exactly, and downcast to float32 only for plotting
+TIME_SERIES_RESULTS = ('balance_history_values', 'balance_history_times',
+                       'normalized_throughput_node_total')
 
 def load_simulation_results(file_path):
     """Load simulation results from HDF5 file."""
     with h5py.File(file_path, 'r') as f:
         # Get the trajectory data
         traj = f['relay_node_channel_rebalancing']
-        run_name = list(traj['results']['runs'].keys())[0]  # Get the first run
+        run_name = next(iter(traj['results']['runs']))  # Get the first run
         run_data = traj['results']['runs'][run_name]
         
-        # Extract results
+        # Extract only the results we use
         results = {}
-        for key in run_data.keys():
-            if isinstance(run_data[key], h5py.Group):
-                # The actual data is nested one level deeper with the same name
-                results[key] = run_data[key][key][()]
+        for key in WANTED_RESULTS:
+            if key not in run_data:
+                continue
+            # The actual data is nested one level deeper with the same name
+            results[key] = run_data[key][key][()]
             
         # Extract parameters
         params = {}
@@ -29,6 +51,11 @@ def load_simulation_results(file_path):
             
     return results, params
 
+def count_rebalancing_ops(balance_values):
+    """Count the steps at which a channel balance changed."""
+    # Compare neighbours directly instead of materialising np.diff
+    return int(np.count_nonzero(balance_values[1:] != balance_values[:-1]))
+
 def plot_comparison_results(all_results, output_dir):
     """Create comparison plots for different rebalancing policies."""
     output_dir = Path(output_dir)
@@ -38,95 +65,103 @@ def plot_comparison_results(all_results, output_dir):
     plt.style.use('default')
     sns.set_theme()
     
-    # 1. Profit Comparison
-    plt.figure(figsize=(12, 6))
-    profits = [results['final_fortune'] - results['initial_fortune'] for results in all_results.values()]
+    # Gather the per-policy scalars into arrays once
     policies = list(all_results.keys())
-    plt.bar(policies, profits)
-    plt.title('Profit by Rebalancing Policy')
-    plt.xlabel('Rebalancing Policy')
-    plt.ylabel('Profit')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(output_dir / 'profit_comparison.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    n = len(all_results)
+    final_fortunes = np.fromiter((r['final_fortune'] for r in all_results.values()), dtype=np.float64, count=n)
+    initial_fortunes = np.fromiter((r['initial_fortune'] for r in all_results.values()), dtype=np.float64, count=n)
+    success_rates = np.fromiter((r['success_rate_node_total'] for r in all_results.values()), dtype=np.float64, count=n)
+    success_counts = np.fromiter((r['success_count_node_total'] for r in all_results.values()), dtype=np.float64, count=n)
+    failure_counts = np.fromiter((r['failure_count_node_total'] for r in all_results.values()), dtype=np.float64, count=n)
+    rebalancing_ops = np.fromiter((count_rebalancing_ops(r['balance_history_values'][0]) for r in all_results.values()),
+                                  dtype=np.int64, count=n)
+    profits = final_fortunes - initial_fortunes
+    
+    # float32 copies of the time series for matplotlib, which needs no more precision
+    plot_series = {policy: {key: np.asarray(r[key], dtype=np.float32) for key in TIME_SERIES_RESULTS if key in r}
+                   for policy, r in all_results.items()}
+    
+    # One figure and Agg canvas reused for every plot, bypassing pyplot
+    fig = Figure(constrained_layout=True)
+    FigureCanvasAgg(fig)
+    
+    def new_axes(figsize):
+        fig.clear()
+        fig.set_size_inches(figsize)
+        return fig.add_subplot(111)
+    
+    # 1. Profit Comparison
+    ax = new_axes((12, 6))
+    ax.bar(policies, profits)
+    ax.set_title('Profit by Rebalancing Policy')
+    ax.set_xlabel('Rebalancing Policy')
+    ax.set_ylabel('Profit')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.savefig(output_dir / 'profit_comparison.png', dpi=300)
     
     # 2. Success Rate Comparison
-    plt.figure(figsize=(12, 6))
-    success_rates = [results['success_rate_node_total'] for results in all_results.values()]
-    plt.bar(policies, success_rates)
-    plt.title('Success Rate by Rebalancing Policy')
-    plt.xlabel('Rebalancing Policy')
-    plt.ylabel('Success Rate')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(output_dir / 'success_rate_comparison.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    ax = new_axes((12, 6))
+    ax.bar(policies, success_rates)
+    ax.set_title('Success Rate by Rebalancing Policy')
+    ax.set_xlabel('Rebalancing Policy')
+    ax.set_ylabel('Success Rate')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.savefig(output_dir / 'success_rate_comparison.png', dpi=300)
     
     # 3. Number of Rebalancing Operations
-    plt.figure(figsize=(12, 6))
-    rebalancing_ops = [np.sum(np.diff(results['balance_history_values'][0]) != 0) for results in all_results.values()]
-    plt.bar(policies, rebalancing_ops)
-    plt.title('Number of Rebalancing Operations by Policy')
-    plt.xlabel('Rebalancing Policy')
-    plt.ylabel('Number of Operations')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(output_dir / 'rebalancing_ops_comparison.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    ax = new_axes((12, 6))
+    ax.bar(policies, rebalancing_ops)
+    ax.set_title('Number of Rebalancing Operations by Policy')
+    ax.set_xlabel('Rebalancing Policy')
+    ax.set_ylabel('Number of Operations')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.savefig(output_dir / 'rebalancing_ops_comparison.png', dpi=300)
     
     # 4. Transaction Success vs Failure
-    plt.figure(figsize=(15, 6))
-    x = np.arange(len(policies))
+    ax = new_axes((15, 6))
+    x = np.arange(n)
     width = 0.35
     
-    success_counts = [results['success_count_node_total'] for results in all_results.values()]
-    failure_counts = [results['failure_count_node_total'] for results in all_results.values()]
-    
-    plt.bar(x - width/2, success_counts, width, label='Success')
-    plt.bar(x + width/2, failure_counts, width, label='Failure')
-    plt.title('Transaction Success vs Failure by Policy')
-    plt.xlabel('Rebalancing Policy')
-    plt.ylabel('Number of Transactions')
-    plt.xticks(x, policies, rotation=45)
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(output_dir / 'transaction_stats_comparison.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    ax.bar(x - width/2, success_counts, width, label='Success')
+    ax.bar(x + width/2, failure_counts, width, label='Failure')
+    ax.set_title('Transaction Success vs Failure by Policy')
+    ax.set_xlabel('Rebalancing Policy')
+    ax.set_ylabel('Number of Transactions')
+    ax.set_xticks(x, policies, rotation=45)
+    ax.legend()
+    fig.savefig(output_dir / 'transaction_stats_comparison.png', dpi=300)
     
     # 5. Channel Balance History Comparison
-    plt.figure(figsize=(15, 8))
-    for policy, results in all_results.items():
+    ax = new_axes((15, 8))
+    for policy, results in plot_series.items():
         times = results['balance_history_times']
         balance_values = results['balance_history_values']
-        plt.plot(times, balance_values[0], label=f'{policy} - Channel L')
-        plt.plot(times, balance_values[1], label=f'{policy} - Channel R', linestyle='--')
-    plt.title('Channel Balance History by Policy')
-    plt.xlabel('Time')
-    plt.ylabel('Balance')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(output_dir / 'balance_history_comparison.png', dpi=300, bbox_inches='tight')
-    plt.close()
+        ax.plot(times, balance_values[0], label=f'{policy} - Channel L')
+        ax.plot(times, balance_values[1], label=f'{policy} - Channel R', linestyle='--')
+    ax.set_title('Channel Balance History by Policy')
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Balance')
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig.savefig(output_dir / 'balance_history_comparison.png', dpi=300)
     
     # 6. Channel Balance Ratio Over Time
-    plt.figure(figsize=(15, 8))
-    for policy, results in all_results.items():
+    ax = new_axes((15, 8))
+    for policy, results in plot_series.items():
         times = results['balance_history_times']
         balance_values = results['balance_history_values']
-        balance_ratio = balance_values[0] / (balance_values[0] + balance_values[1])
-        plt.plot(times, balance_ratio, label=policy)
-    plt.title('Channel Balance Ratio Over Time')
-    plt.xlabel('Time')
-    plt.ylabel('Balance Ratio (Channel L / Total)')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(output_dir / 'balance_ratio_comparison.png', dpi=300, bbox_inches='tight')
-    plt.close()
+        # Reuse the sum buffer for the quotient
+        total = balance_values[0] + balance_values[1]
+        balance_ratio = np.divide(balance_values[0], total, out=total)
+        ax.plot(times, balance_ratio, label=policy)
+    ax.set_title('Channel Balance Ratio Over Time')
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Balance Ratio (Channel L / Total)')
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig.savefig(output_dir / 'balance_ratio_comparison.png', dpi=300)
     
     # 7. Scalability Analysis
-    plt.figure(figsize=(15, 8))
-    for policy, results in all_results.items():
+    ax = new_axes((15, 8))
+    for policy, results in plot_series.items():
         times = results['balance_history_times']
         throughput = results['normalized_throughput_node_total']
         # Flatten throughput if needed
@@ -136,26 +171,24 @@ def plot_comparison_results(all_results, output_dir):
                 throughput = throughput[:times.shape[0]]
             elif throughput.shape[0] < times.shape[0]:
                 times = times[:throughput.shape[0]]
-        plt.plot(times, throughput, label=policy)
-    plt.title('Scalability Analysis - Throughput Over Time')
-    plt.xlabel('Time')
-    plt.ylabel('Normalized Throughput')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(output_dir / 'scalability_comparison.png', dpi=300, bbox_inches='tight')
-    plt.close()
+        ax.plot(times, throughput, label=policy)
+    ax.set_title('Scalability Analysis - Throughput Over Time')
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Normalized Throughput')
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig.savefig(output_dir / 'scalability_comparison.png', dpi=300)
 
 def main():
     # Find all simulation result files
     result_files = glob.glob('../outputs/results/results_*.hdf5')
     
-    # Load results for each policy
+    # Load results for each policy; every worker opens its own file handle
     all_results = {}
-    for file_path in result_files:
-        results, params = load_simulation_results(file_path)
-        # Extract policy name from the file path
-        policy = file_path.split('_')[-1].split('.')[0]  # Get the policy name from filename
-        all_results[policy] = results
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(result_files)))) as executor:
+        for file_path, (results, params) in zip(result_files, executor.map(load_simulation_results, result_files)):
+            # Extract policy name from the file path
+            policy = file_path.split('_')[-1].split('.')[0]  # Get the policy name from filename
+            all_results[policy] = results
     
     # Create comparison plots
     plot_comparison_results(all_results, 'simulation_output')
@@ -169,7 +202,7 @@ def main():
         print(f"Initial Fortune: {results['initial_fortune']}")
         print(f"Final Fortune: {results['final_fortune']}")
         print(f"Profit: {results['final_fortune'] - results['initial_fortune']}")
-        print(f"Number of Rebalancing Operations: {np.sum(np.diff(results['balance_history_values'][0]) != 0)}")
+        print(f"Number of Rebalancing Operations: {count_rebalancing_ops(results['balance_history_values'][0])}")
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
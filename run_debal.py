@@ -59,32 +59,31 @@ def create_test_network():
 
 def print_network_state(env, debal_manager, title="Network State"):
     """Print detailed network state."""
+    nodes_by_id = {n.id: n for n in debal_manager.nodes}
+    
     print(f"\n{title}")
     print("=" * 50)
     print(f"Leader: {debal_manager.leader_election.current_leader}")
     print(f"Election Time: {debal_manager.leader_election.leader_timeout}")
     
     # Count nodes that have requested rebalancing
-    pending_requests = sum(1 for node in debal_manager.nodes if node.rebalancing_requested)
+    pending_requests = sum(node.rebalancing_requested for node in debal_manager.nodes)
     print(f"Pending Requests: {pending_requests}")
     
     # Print channel balances
     print("\nChannel Balances:")
     print("Channel (u→v)   Balances (lu→v, ru→v)")
     print("---------------------------------------------")
-    # Create a sorted list of unique channel pairs
-    channel_pairs = []
-    for node in debal_manager.nodes:
-        for peer_id in node.local_balances.keys():
-            if (node.id, peer_id) not in channel_pairs and (peer_id, node.id) not in channel_pairs:
-                if node.id < peer_id:
-                    channel_pairs.append((node.id, peer_id))
-                else:
-                    channel_pairs.append((peer_id, node.id))
+    # Collect unique channel pairs, ordered within each pair
+    channel_pairs = {
+        tuple(sorted((node.id, peer_id)))
+        for node in debal_manager.nodes
+        for peer_id in node.local_balances
+    }
     
     # Print each channel's balances
     for node_id, peer_id in sorted(channel_pairs):
-        node = next(n for n in debal_manager.nodes if n.id == node_id)
+        node = nodes_by_id[node_id]
         local = node.local_balances[peer_id]
         remote = node.remote_balances[peer_id]
         print(f"{node_id}→{peer_id}       ({local:>4.1f}, {remote:>4.1f})")
@@ -93,21 +92,19 @@ def print_network_state(env, debal_manager, title="Network State"):
     print("\nNode States:")
     print("Node  Requesting Outgoing Ratio  Incoming Ratio")
     print("--------------------------------------------------")
+    requesting_nodes = []
     for node in debal_manager.nodes:
         requesting = node.rebalancing_requested
-        total_local = sum(node.local_balances.values())
-        total_remote = sum(node.remote_balances.values())
+        total_local = node.get_total_outgoing_liquidity()
+        total_remote = node.get_total_incoming_liquidity()
         total = total_local + total_remote
         out_ratio = total_local / total if total > 0 else 0.0
         in_ratio = total_remote / total if total > 0 else 0.0
         print(f"{node.id} {requesting!s:<9} {out_ratio:.2f}            {in_ratio:.2f}")
+        if requesting:
+            requesting_nodes.append((node.id, out_ratio))
     
     # Print requesting nodes
-    requesting_nodes = [
-        (node.id, node.get_total_outgoing_liquidity() / (node.get_total_outgoing_liquidity() + node.get_total_incoming_liquidity()))
-        for node in debal_manager.nodes
-        if node.rebalancing_requested
-    ]
     if requesting_nodes:
         print("\nRequesting Nodes:")
         for node_id, ratio in requesting_nodes:
@@ -14,5 +14,10 @@ setup(
         "numpy>=1.19.0",
         "matplotlib>=3.3.0"
     ],
+    extras_require={
+        # Compiled kernels in src/entities/_kernels.py and src/learning/_kernels.py;
+        # without numba the NumPy fallbacks are used
+        "numba": ["numba>=0.56.0"],
+    },
     python_requires=">=3.8",
 ) 
\ No newline at end of file
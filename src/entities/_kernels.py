@@ -0,0 +1,151 @@
+"""
+Numeric kernels for the per-node DEBAL checks.
+
+The kernels are compiled with numba when it is installed. Without numba the
+same functions are provided as NumPy expressions over the whole arrays.
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # numba is optional
+    HAVE_NUMBA = False
+
+
+def _jit(func):
+    """Compile a scalar kernel with numba when available; run it as Python otherwise."""
+    return njit(cache=True, fastmath=True)(func) if HAVE_NUMBA else func
+
+
+if HAVE_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def should_rebalance(local, remote, cap, theta, tau, out_rate, in_rate, eps):
+        """Fused balance-ratio and TTD check in a single pass over the channels."""
+        total = 0.0
+        violated = False
+        for i in range(local.shape[0]):
+            total += local[i]
+            if min(local[i], remote[i]) < theta * cap[i]:
+                violated = True
+        return violated or total / max(out_rate - in_rate, eps) < tau
+else:
+    def should_rebalance(local, remote, cap, theta, tau, out_rate, in_rate, eps):
+        """Fused balance-ratio and TTD check in a single pass over the channels."""
+        if np.any(np.minimum(local, remote) < theta * cap):
+            return True
+        return local.sum() / max(out_rate - in_rate, eps) < tau
+
+
+if HAVE_NUMBA:
+    @njit(parallel=True, cache=True, fastmath=True)
+    def leader_eligibility(local, remote, cap, node_off, node_deg, rows, kappa, theta):
+        """Whether each node row of the channel table has a channel meeting the leader criteria."""
+        out = np.zeros(rows.shape[0], dtype=np.bool_)
+        # Nodes are independent, so they are checked in parallel
+        for j in prange(rows.shape[0]):
+            start = node_off[rows[j]]
+            for k in range(start, start + node_deg[rows[j]]):
+                if local[k] >= kappa * cap[k] or abs(local[k] - remote[k]) >= theta * cap[k]:
+                    out[j] = True
+                    break
+        return out
+else:
+    def leader_eligibility(local, remote, cap, node_off, node_deg, rows, kappa, theta):
+        """Whether each node row of the channel table has a channel meeting the leader criteria."""
+        ok = (local >= kappa * cap) | (np.abs(local - remote) >= theta * cap)
+        # Count qualifying channels in each node's run with one cumulative sum
+        counts = np.concatenate(([0], np.cumsum(ok)))
+        start = node_off[rows]
+        return counts[start + node_deg[rows]] > counts[start]
+
+
+@_jit
+def hop_feasibility(capacity, local, remote, amount, sigma):
+    """
+    Whether channels can carry a transfer of the amount.
+    
+    The one definition of the per-hop checks: enough local balance, both
+    balances stay above 20% of capacity, and the skewness stays within
+    sigma unless it improves. Works on scalars and on arrays of hops.
+    """
+    new_local = local - amount
+    new_remote = remote + amount
+    min_balance = 0.2 * capacity
+    current_skew = np.abs(local - remote) / capacity
+    new_skew = np.abs(new_local - new_remote) / capacity
+    return ((local >= amount) &
+            (new_local >= min_balance) & (new_remote >= min_balance) &
+            np.logical_not((new_skew > sigma) & (new_skew >= current_skew)))
+
+
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def transfer_scores(capacity, local, remote, amounts, sigma):
+        """Feasibility and imbalance improvement of moving each amount along a path's hops."""
+        feasible = np.ones(amounts.shape[0], dtype=np.bool_)
+        improvement = np.zeros(amounts.shape[0])
+        for a in range(amounts.shape[0]):
+            amount = amounts[a]
+            for k in range(local.shape[0]):
+                if not hop_feasibility(capacity[k], local[k], remote[k], amount, sigma):
+                    feasible[a] = False
+                    break
+                improvement[a] += (abs(local[k] - remote[k]) - abs(local[k] - remote[k] - 2 * amount)) / capacity[k]
+        return feasible, improvement
+else:
+    def transfer_scores(capacity, local, remote, amounts, sigma):
+        """Feasibility and imbalance improvement of moving each amount along a path's hops."""
+        grid = amounts[:, None]
+        feasible = hop_feasibility(capacity, local, remote, grid, sigma).all(axis=1)
+        improvement = ((np.abs(local - remote) - np.abs(local - remote - 2 * grid)) / capacity).sum(axis=1)
+        return feasible, improvement
+
+
+@_jit
+def decide_rebalancing(state, cap_L, cap_R, local_L, local_R):
+    """
+    DEBAL rebalancing decision for a relay node with channels L and R.
+    
+    Returns (rule, channel, amount): the rule that fired (0 none, 1 channel
+    imbalance, 2 low local balance, 3 low remote balance), the channel to
+    rebalance (0 for L, 1 for R, -1 for none) and the amount to move.
+    """
+    L_imbalance = abs(state[0] - state[2])
+    R_imbalance = abs(state[1] - state[3])
+    
+    # 1. Significant imbalance: bring the worse channel to 50%
+    if L_imbalance > 0.2 or R_imbalance > 0.2:
+        if L_imbalance > R_imbalance:
+            return 1, 0, cap_L * 0.5 - local_L
+        return 1, 1, cap_R * 0.5 - local_R
+        
+    # 2. Low local balance: bring the lower channel to 40%
+    if state[0] < 0.3 or state[1] < 0.3:
+        if state[0] < state[1]:
+            return 2, 0, cap_L * 0.4 - local_L
+        return 2, 1, cap_R * 0.4 - local_R
+        
+    # 3. Low remote balance: bring the channel with lower remote balance to 60%
+    if state[2] < 0.3 or state[3] < 0.3:
+        if state[2] < state[3]:
+            return 3, 0, cap_L * 0.6 - local_L
+        return 3, 1, cap_R * 0.6 - local_R
+        
+    return 0, -1, 0.0
+
+
+@_jit
+def rebalancing_reward(state, action, next_state, mean_fee_rate):
+    """Imbalance reduction between two states minus the cost of the rebalancing action."""
+    current_imbalance = abs(state[0] - state[1]) + abs(state[2] - state[3])
+    next_imbalance = abs(next_state[0] - next_state[1]) + abs(next_state[2] - next_state[3])
+    return (current_imbalance - next_imbalance) - abs(action) * mean_fee_rate
+
+
+def warm_up():
+    """Compile the scalar kernels for float arguments ahead of the first simulated rebalancing check."""
+    if HAVE_NUMBA:
+        state = np.zeros(4)
+        decide_rebalancing(state, 1.0, 1.0, 0.0, 0.0)
+        rebalancing_reward(state, 0.0, state, 0.0)
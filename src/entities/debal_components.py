@@ -1,91 +1,83 @@
 import numpy as np
 from typing import Dict, List, Tuple
 
+from ._kernels import should_rebalance
+
 class DEBALNodeState:
     def __init__(self, theta: float = 0.35, tau: float = 1.5, epsilon: float = 0.001):
         self.theta = theta  # Minimum balance ratio threshold
         self.tau = tau      # TTD threshold in hours
         self.epsilon = epsilon  # Small constant to prevent division by zero
         
-    def calculate_ttd(self, local_balances: Dict[str, float], 
+    def calculate_ttd(self, total_local_balance: float, 
                      outgoing_rate: float, incoming_rate: float) -> float:
         """
         Calculate Time To Depletion (TTD) based on current balances and transaction rates.
         
         Args:
-            local_balances: Dictionary of local balances for each channel
+            total_local_balance: Sum of local balances over all channels
             outgoing_rate: Rate of outgoing transactions
             incoming_rate: Rate of incoming transactions
             
         Returns:
             float: Estimated time until liquidity depletion in hours
         """
-        total_local_balance = sum(local_balances.values())
         net_flow = max(outgoing_rate - incoming_rate, self.epsilon)
         return total_local_balance / net_flow
         
-    def check_balance_ratios(self, local_balances: Dict[str, float], 
-                           remote_balances: Dict[str, float], 
-                           capacities: Dict[str, float]) -> bool:
+    def check_balance_ratios(self, local_balances: np.ndarray, 
+                           remote_balances: np.ndarray, 
+                           capacities: np.ndarray) -> bool:
         """
         Check if any channel violates the minimum balance ratio constraint.
         
         Args:
-            local_balances: Dictionary of local balances
-            remote_balances: Dictionary of remote balances
-            capacities: Dictionary of channel capacities
+            local_balances: Array of local balances
+            remote_balances: Array of remote balances
+            capacities: Array of channel capacities
             
         Returns:
             bool: True if any channel violates the constraint, False otherwise
         """
-        for channel in local_balances.keys():
-            local_ratio = local_balances[channel] / capacities[channel]
-            remote_ratio = remote_balances[channel] / capacities[channel]
-            min_ratio = min(local_ratio, remote_ratio)
-            if min_ratio < self.theta:
-                return True
-        return False
+        # min(l, r) / c < theta, multiplied through to avoid the division
+        return bool(np.any(np.minimum(local_balances, remote_balances) < self.theta * capacities))
         
-    def calculate_skewness(self, local_balance: float, remote_balance: float, 
-                          capacity: float) -> float:
+    def calculate_skewness(self, local_balance: np.ndarray, remote_balance: np.ndarray, 
+                          capacity: np.ndarray) -> np.ndarray:
         """
         Calculate channel skewness.
         
+        Works on scalars or on arrays holding one entry per channel.
+        
         Args:
-            local_balance: Local balance of the channel
-            remote_balance: Remote balance of the channel
-            capacity: Channel capacity
+            local_balance: Local balance(s) of the channel(s)
+            remote_balance: Remote balance(s) of the channel(s)
+            capacity: Channel capacity (or capacities)
             
         Returns:
-            float: Skewness value between 0 and 1
+            Skewness value(s) between 0 and 1
         """
-        return abs(local_balance - remote_balance) / capacity
+        return np.abs(local_balance - remote_balance) / capacity
         
-    def should_request_rebalancing(self, local_balances: Dict[str, float],
-                                 remote_balances: Dict[str, float],
-                                 capacities: Dict[str, float],
+    def should_request_rebalancing(self, local_balances: np.ndarray,
+                                 remote_balances: np.ndarray,
+                                 capacities: np.ndarray,
                                  outgoing_rate: float,
                                  incoming_rate: float) -> bool:
         """
         Determine if rebalancing should be requested based on TTD and balance ratios.
         
         Args:
-            local_balances: Dictionary of local balances
-            remote_balances: Dictionary of remote balances
-            capacities: Dictionary of channel capacities
+            local_balances: Array of local balances
+            remote_balances: Array of remote balances
+            capacities: Array of channel capacities
             outgoing_rate: Rate of outgoing transactions
             incoming_rate: Rate of incoming transactions
             
         Returns:
             bool: True if rebalancing should be requested, False otherwise
         """
-        # Check balance ratios
-        if self.check_balance_ratios(local_balances, remote_balances, capacities):
-            return True
-            
-        # Check TTD
-        ttd = self.calculate_ttd(local_balances, outgoing_rate, incoming_rate)
-        if ttd < self.tau:
-            return True
-            
-        return False 
\ No newline at end of file
+        # Balance ratio and TTD checks fused into one kernel call
+        return bool(should_rebalance(local_balances, remote_balances, capacities,
+                                     self.theta, self.tau, outgoing_rate, incoming_rate,
+                                     self.epsilon)) 
\ No newline at end of file
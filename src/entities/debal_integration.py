@@ -12,10 +12,12 @@ network rebalancing:
 The module provides a high-level interface for managing the rebalancing process.
 """
 
+from functools import partial
 from typing import List, Dict, Optional
+import numpy as np
 import simpy
 import networkx as nx
-from src.entities.node import Node
+from src.entities.node import Node, BALANCE_DTYPE
 from src.entities.debal_components import DEBALNodeState
 from src.entities.leader_election import LeaderElection
 from src.entities.rebalancing_engine import RebalancingEngine
@@ -43,11 +45,15 @@ class DEBALManager:
         """
         self.env = env
         self.nodes = nodes
+        self.node_by_id = {node.id: node for node in nodes}
+        for i, node in enumerate(nodes):
+            node.idx = i  # Row of the node in GNN features
+        self._node_ids = [node.id for node in nodes]  # graph names in GNN row order
         self.network_graph = network_graph
         
         # Initialize components
         self.node_states = {node: DEBALNodeState(theta, tau) for node in nodes}
-        self.leader_election = LeaderElection(kappa=kappa, theta=theta, delta_t=delta_t)
+        self.leader_election = LeaderElection(kappa=kappa, theta=theta, delta_t=delta_t, nodes=nodes)
         self.rebalancing_engine = RebalancingEngine(sigma=0.2)  # Allow more skewness
         self.rebalancing_engine.nodes = {node.id: node for node in nodes}  # Initialize nodes
         self.scheduler = RebalancingScheduler(
@@ -59,12 +65,28 @@ class DEBALManager:
         )
         self.gnn = BalanceAwareGNN()
         
+        # Network-wide channel table (one row per directed channel, grouped by node)
+        self._local = None
+        self._remote = None
+        self._cap = None
+        self._build_soa()
+        
+        # GNN state is recomputed on demand only after balances changed; the
+        # changed nodes are tracked so a few updates only refresh their rows
+        self._gnn_dirty = True
+        self._dirty_nodes = None  # node rows changed since the last update, None for all
+        
+        # Per-node entries of get_network_state, rebuilt only when the node changed
+        self._state_snapshot = {}
+        self._state_versions = {}
+        
         # Initialize node states
         for node in nodes:
             node.debal_state = self.node_states[node]
             node.leader_id = None
             node.election_timestamp = None
             node.rebalancing_requested = False
+            node._balance_callback = partial(self._mark_gnn_dirty, node)
             
     def start(self):
         """
@@ -76,38 +98,131 @@ class DEBALManager:
         # Initialize GNN with current network state
         self.env.process(self._update_gnn_state())
         
+    def _build_soa(self):
+        """
+        Lay out every node's channels in shared arrays.
+        
+        Each node's channel arrays become views into the shared local, remote
+        and capacity arrays, so balance updates on a node are visible here
+        without copying. Nodes occupy contiguous runs starting at
+        `self._node_off`, which makes per-node reductions a single reduceat.
+        The buffers used by `_recompute_gnn` are allocated here too, so they
+        are only reallocated when the topology changes.
+        """
+        deg = np.fromiter((len(node.cap_arr) for node in self.nodes), np.int64, len(self.nodes))
+        off = np.zeros(len(self.nodes), dtype=np.int64)
+        np.cumsum(deg[:-1], out=off[1:])
+        n_edges = int(deg.sum())
+        
+        self._deg = deg
+        self._node_off = off
+        # Rows of one block: capacity, local, remote; its transpose is the edge feature matrix
+        self._table = np.empty((3, n_edges), dtype=BALANCE_DTYPE)
+        self._cap, self._local, self._remote = self._table
+        self._edge_index = np.empty((n_edges, 2), dtype=np.int64)
+        self._edge_of = {}  # {(node_id, neighbor_id): row in the channel table}
+        for i, node in enumerate(self.nodes):
+            start, end = off[i], off[i] + deg[i]
+            for neighbor_id, slot in node._slot.items():
+                self._edge_of[(node.id, neighbor_id)] = start + slot
+            node._bind_arrays(self._local[start:end], self._remote[start:end], self._cap[start:end])
+            self._edge_index[start:end, 0] = i
+            # -1 marks channels to peers this manager does not hold (e.g. "L"/"R" in the relay model)
+            self._edge_index[start:end, 1] = [getattr(self.node_by_id.get(neighbor_id), 'idx', -1)
+                                              for neighbor_id in node._slot]
+            
+        # Those channels still count in the node features and balance checks,
+        # but are left out of the GNN graph
+        known = self._edge_index[:, 1] >= 0
+        if known.all():
+            self._gnn_edges = None
+            self._gnn_edge_index = self._edge_index
+        else:
+            self._gnn_edges = np.flatnonzero(known)
+            self._gnn_edge_index = self._edge_index[self._gnn_edges]
+            self._gnn_edge_pos = np.full(n_edges, -1, dtype=np.int64)  # table row -> GNN edge, -1 if left out
+            self._gnn_edge_pos[self._gnn_edges] = np.arange(len(self._gnn_edges))
+            
+        # Scratch buffers for the GNN features
+        self._has_channels = deg > 0
+        self._starts = off[self._has_channels]
+        self._inv_deg = 1.0 / deg[self._has_channels]
+        self._ratio_buf = np.empty((2, n_edges), dtype=np.float64)
+        self._sum_buf = np.empty((2, len(self._starts)), dtype=np.float64)
+        self._node_feat = np.zeros((len(self.nodes), 2), dtype=np.float64)
+        
+        self.leader_election.bind_channel_table(self._table, off, deg)
+        self.rebalancing_engine.bind_channel_table(self._table, self._edge_of)
+            
+    def _soa_current(self) -> bool:
+        """Check that every node still writes into the shared channel arrays."""
+        return all(node._arrays_current() and node._local_arr.base is self._table
+                   for node in self.nodes)
+        
+    def _mark_gnn_dirty(self, node: Node = None):
+        """
+        Flag the GNN state as stale after a balance change.
+        
+        Args:
+            node: Node whose channels changed; None marks every node
+        """
+        self._gnn_dirty = True
+        if node is None:
+            self._dirty_nodes = None
+        elif self._dirty_nodes is not None:
+            self._dirty_nodes.add(node.idx)
+        
+    def _recompute_gnn(self):
+        """Recompute the GNN state from the current channel balances."""
+        # Re-layout the shared arrays if any node's channels changed
+        dirty = self._dirty_nodes
+        if not self._soa_current():
+            self._build_soa()
+            dirty = None
+        self._dirty_nodes = set()
+        self._gnn_dirty = False
+        
+        # A few changed nodes: refresh only their feature rows and channels
+        if dirty is not None and len(dirty) * 2 <= len(self.nodes):
+            rows = sorted(i for i in dirty if self._deg[i])
+            for i in rows:
+                start, end = self._node_off[i], self._node_off[i] + self._deg[i]
+                ratios = self._table[1:, start:end] / self._cap[start:end]
+                self._node_feat[i] = ratios.sum(axis=1) * (1.0 / self._deg[i])
+            dirty_edges = np.concatenate(
+                [np.arange(self._node_off[i], self._node_off[i] + self._deg[i]) for i in rows]
+                or [np.empty(0, dtype=np.int64)])
+            if self._gnn_edges is not None:
+                dirty_edges = self._gnn_edge_pos[dirty_edges]
+                dirty_edges = dirty_edges[dirty_edges >= 0]
+            # Nodes are re-embedded by row: a node whose channels all go to
+            # unmanaged peers has no dirty GNN edge to derive its row from
+            self.gnn.update_state(self._node_feat, self._gnn_edge_index, self._gnn_edge_features(),
+                                  self._node_ids, dirty_edges=dirty_edges, dirty_nodes=rows)
+            return
+        
+        # Node features: average local/remote balance ratio per node, 0 for isolated nodes
+        if len(self._starts):
+            np.divide(self._table[1:], self._cap, out=self._ratio_buf)
+            np.add.reduceat(self._ratio_buf, self._starts, axis=1, out=self._sum_buf)
+            self._sum_buf *= self._inv_deg
+            self._node_feat[self._has_channels] = self._sum_buf.T
+        
+        # Edge features (channel capacities, current balances) are a view of the table
+        self.gnn.update_state(self._node_feat, self._gnn_edge_index, self._gnn_edge_features(), self._node_ids)
+        
+    def _gnn_edge_features(self) -> np.ndarray:
+        """Capacity, local and remote balance of each GNN edge; a view of the table when no channel is left out."""
+        if self._gnn_edges is None:
+            return self._table.T
+        return self._table.T[self._gnn_edges]
+        
     def _update_gnn_state(self):
         """Update GNN state periodically."""
         while True:
-            # Prepare node features
-            node_features = []
-            for node in self.nodes:
-                if not node.local_balances:
-                    node_features.append([0.0, 0.0])  # Default features for isolated nodes
-                    continue
-                    
-                # Calculate average balance ratios
-                local_ratios = [bal / node.capacities[n] for n, bal in node.local_balances.items()]
-                remote_ratios = [bal / node.capacities[n] for n, bal in node.remote_balances.items()]
-                avg_local = sum(local_ratios) / len(local_ratios)
-                avg_remote = sum(remote_ratios) / len(remote_ratios)
-                node_features.append([avg_local, avg_remote])
-            
-            # Prepare edge features (channel capacities, current balances)
-            edge_features = []
-            edge_index = []
-            for i, node in enumerate(self.nodes):
-                for neighbor_id, capacity in node.capacities.items():
-                    j = int(neighbor_id.split('_')[1])  # Get node index from ID
-                    edge_index.append([i, j])
-                    edge_features.append([
-                        capacity,
-                        node.local_balances[neighbor_id],
-                        node.remote_balances[neighbor_id]
-                    ])
-            
-            # Update GNN state
-            self.gnn.update_state(node_features, edge_index, edge_features)
+            # Idle ticks cost nothing: only recompute after balances changed
+            if self._gnn_dirty:
+                self._recompute_gnn()
             
             # Wait before next update
             yield self.env.timeout(60.0)  # Update every minute
@@ -138,8 +253,9 @@ class DEBALManager:
         Returns:
             bool: True if rebalancing was successful, False otherwise
         """
-        # Update GNN state
-        self._update_gnn_state()
+        # Refresh GNN state if balances changed since the last update
+        if self._gnn_dirty:
+            self._recompute_gnn()
         
         # Get ranked paths
         paths = self.gnn.rank_paths(
@@ -151,13 +267,28 @@ class DEBALManager:
             self.gnn.edge_index
         )
         
-        # Try each path until successful
-        for score, path in paths:
-            if self.rebalancing_engine.validate_path(path, amount):
-                if self.rebalancing_engine.execute_transfer(path, amount):
-                    return True
-                    
-        return False
+        # Execute the best-ranked path that passed the batched check; it was
+        # validated against the current balances, so it is not checked again
+        feasible = self._feasible_paths([path for _, path in paths], amount)
+        if not feasible:
+            return False
+        return self.rebalancing_engine.commit_transfer(feasible[0], amount)
+        
+    def _feasible_paths(self, paths: List[List[str]], amount: float) -> List[List[str]]:
+        """
+        Filter candidate paths with one vectorized balance check over all their hops.
+        
+        Args:
+            paths: Candidate paths as lists of node IDs
+            amount: Amount to transfer
+            
+        Returns:
+            The paths whose every hop passes the engine's checks, in input order
+        """
+        if not self._soa_current():
+            self._build_soa()
+            
+        return self.rebalancing_engine.feasible_paths(paths, amount)
         
     def get_network_state(self) -> Dict:
         """
@@ -170,16 +301,25 @@ class DEBALManager:
                 - node_states: Dictionary of node states
                 - pending_requests: Number of pending rebalancing requests
         """
+        node_states = {}
+        pending = 0
+        for node in self.nodes:
+            requested = node.rebalancing_requested
+            pending += bool(requested)
+            version = (node.balance_version, requested)
+            if self._state_versions.get(node.id) != version:
+                # Fresh dicts so that earlier snapshots keep their values
+                self._state_snapshot[node.id] = {
+                    "local_balances": dict(node.local_balances),
+                    "remote_balances": dict(node.remote_balances),
+                    "rebalancing_requested": requested
+                }
+                self._state_versions[node.id] = version
+            node_states[node.id] = self._state_snapshot[node.id]
+            
         return {
             "leader_id": self.scheduler.current_leader.id if self.scheduler.current_leader else None,
             "election_time": self.scheduler.last_election_time,
-            "node_states": {
-                node.id: {
-                    "local_balances": node.local_balances,
-                    "remote_balances": node.remote_balances,
-                    "rebalancing_requested": node.rebalancing_requested
-                }
-                for node in self.nodes
-            },
-            "pending_requests": sum(1 for node in self.nodes if node.rebalancing_requested)
-        } 
\ No newline at end of file
+            "node_states": node_states,
+            "pending_requests": pending
+        }
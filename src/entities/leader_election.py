@@ -1,14 +1,23 @@
 """
 Leader election module for DEBAL.
+
+Leaders are chosen by the highest 64-bit BLAKE2b hash of the election
+timestamp followed by the node ID. The hash only has to spread candidates
+uniformly, not resist attacks, so a short fast digest is used. All peers
+must use the same hash for announcements to verify.
 """
 
 import time
 import hashlib
+import numpy as np
+from operator import itemgetter
 from typing import List, Dict, Optional, Any
+from ._kernels import leader_eligibility
 from .node import Node
 
 class LeaderElection:
-    def __init__(self, kappa: float = 0.5, theta: float = 0.2, delta_t: float = 3600.0):
+    def __init__(self, kappa: float = 0.5, theta: float = 0.2, delta_t: float = 3600.0,
+                 nodes: Optional[List[Node]] = None):
         """
         Initialize leader election with DEBAL parameters.
         
@@ -16,26 +25,134 @@ class LeaderElection:
             kappa: Minimum outgoing balance threshold (as a ratio of total capacity)
             theta: Minimum balance ratio threshold
             delta_t: Re-election interval in seconds
+            nodes: Nodes to register for id lookup and request tracking (optional)
         """
         self.kappa = kappa
         self.theta = theta
         self.delta_t = delta_t
         self.leader_timeout = 0.0
         self.current_leader = None
+        self.node_by_id = {}
+        self._requesting = {}  # requesting nodes, in request order
+        self._channel_table = None
+        self._node_off = None
+        self._node_deg = None
+        if nodes is not None:
+            self.register_nodes(nodes)
+            
+    def set_thresholds(self, kappa: float, theta: float):
+        """
+        Change the eligibility thresholds.
+        
+        Per-node threshold arrays and cached eligibility are keyed by the
+        thresholds, so they are refreshed on the next check.
+        
+        Args:
+            kappa: Minimum outgoing balance threshold
+            theta: Minimum balance ratio threshold
+        """
+        self.kappa = kappa
+        self.theta = theta
+        
+    def register_nodes(self, nodes: List[Node]):
+        """
+        Register the participating nodes.
+        
+        Registered nodes are looked up by id when verifying announcements, and
+        their rebalancing requests are tracked so that elections only look at
+        requesting nodes instead of scanning the whole network.
+        
+        Args:
+            nodes: Nodes participating in elections
+        """
+        # Other elections over the same nodes keep their own listeners
+        for node in self.node_by_id.values():
+            if self._on_request_change in node._request_listeners:
+                node._request_listeners.remove(self._on_request_change)
+        self.node_by_id = {node.id: node for node in nodes}
+        self._requesting = {node: None for node in nodes if node.rebalancing_requested}
+        for node in nodes:
+            node._request_listeners.append(self._on_request_change)
+            
+    def bind_channel_table(self, table: np.ndarray, node_off: np.ndarray, node_deg: np.ndarray):
+        """
+        Use a shared channel table for bulk eligibility checks.
+        
+        The table holds the capacity, local and remote rows of every channel,
+        with node `node.idx` owning the run of `node_deg[idx]` channels starting
+        at `node_off[idx]`. Elections then check all requesting nodes in one
+        kernel call instead of one node at a time.
+        
+        Args:
+            table: (3, E) array of capacities, local and remote balances
+            node_off: First channel row of each node
+            node_deg: Number of channels of each node
+        """
+        self._channel_table = table
+        self._node_off = node_off
+        self._node_deg = node_deg
+        
+    def _on_request_change(self, node: Node, requested: bool):
+        """Track a registered node's rebalancing request flag."""
+        if requested:
+            self._requesting[node] = None
+        else:
+            self._requesting.pop(node, None)
+        
+    def has_pending_requests(self, nodes: List[Node]) -> bool:
+        """
+        Check whether any node has requested rebalancing.
+        
+        Registered nodes report their requests as they change, so this does
+        not scan the network.
+        
+        Args:
+            nodes: Nodes to scan when none are registered
+            
+        Returns:
+            True if at least one node is requesting rebalancing
+        """
+        if self.node_by_id:
+            return bool(self._requesting)
+        return any(node.rebalancing_requested for node in nodes)
+        
+    def requesting_nodes(self, nodes: List[Node]) -> List[Node]:
+        """
+        Nodes that have requested rebalancing.
+        
+        Args:
+            nodes: Nodes to scan when none are registered
+            
+        Returns:
+            The requesting nodes, in request order for registered nodes
+        """
+        if self.node_by_id:
+            return list(self._requesting)
+        return [node for node in nodes if node.rebalancing_requested]
+        
+    def _timestamp_hasher(self, timestamp: float):
+        """
+        Hash context already fed with the timestamp.
+        
+        The timestamp is hashed first so that one context can be copied for
+        every node in an election and only the node ID is fed per node.
+        """
+        return hashlib.blake2b(f"{timestamp}".encode('utf-8'), digest_size=8)
         
-    def compute_hash(self, node_id: str, timestamp: float) -> str:
+    def compute_hash(self, node_id: str, timestamp: float) -> int:
         """
-        Compute the SHA-256 hash of node ID and timestamp.
+        Compute the 64-bit hash of timestamp and node ID.
         
         Args:
             node_id: Node identifier
             timestamp: Current timestamp
             
         Returns:
-            str: Hexadecimal hash value
+            int: Hash value
         """
-        message = f"{node_id}{timestamp}".encode('utf-8')
-        return hashlib.sha256(message).hexdigest()
+        h = self._timestamp_hasher(timestamp)
+        h.update(f"{node_id}".encode('utf-8'))
+        return int.from_bytes(h.digest(), 'big')
         
     def is_eligible_leader(self, node: Node) -> bool:
         """
@@ -55,21 +172,39 @@ class LeaderElection:
         if not node.rebalancing_requested:
             return False
             
-        # Check if any channel meets the criteria
-        for channel_id in node.local_balances:
-            local = node.local_balances[channel_id]
-            remote = node.remote_balances[channel_id]
-            capacity = node.capacities[channel_id]
+        # Reuse the last result while balances and thresholds are unchanged
+        key = (node.balance_version, self.kappa, self.theta)
+        cached_key, eligible = node._eligible_cache
+        if cached_key == key:
+            return eligible
             
-            # Check outgoing balance ratio
-            if local / capacity >= self.kappa:
-                return True
-                
-            # Check for significant imbalance
-            if abs(local - remote) >= capacity * self.theta:
-                return True
-                
-        return False
+        node._eligible_cache = (key, self._check_channels(node))
+        return node._eligible_cache[1]
+        
+    def _check_channels(self, node: Node) -> bool:
+        """Check whether any of the node's channels meets the leader criteria."""
+        kappa_cap, theta_cap = node.channel_thresholds(self.kappa, self.theta)
+        local = node.local_arr
+        remote = node.remote_arr
+        
+        # Outgoing balance ratio at least kappa, or a significant imbalance
+        return bool(((local >= kappa_cap) | (np.abs(local - remote) >= theta_cap)).any())
+        
+    def _eligible_from_table(self, candidates) -> Optional[List[Node]]:
+        """
+        Eligible candidates from one pass over the bound channel table.
+        
+        Returns None if a candidate's channels no longer live in the table.
+        """
+        table = self._channel_table
+        candidates = [node for node in candidates if node.rebalancing_requested]
+        if not all(node._arrays_current() and node._local_arr.base is table for node in candidates):
+            return None
+        rows = np.fromiter((node.idx for node in candidates), np.int64, len(candidates))
+        cap, local, remote = table
+        mask = leader_eligibility(local, remote, cap, self._node_off, self._node_deg,
+                                  rows, self.kappa, self.theta)
+        return [node for node, eligible in zip(candidates, mask) if eligible]
         
     def elect_leader(self, nodes: List[Node], timestamp: float) -> tuple[Optional[Node], float]:
         """
@@ -78,7 +213,8 @@ class LeaderElection:
         The leader is chosen as the eligible node with the highest hash value.
         
         Args:
-            nodes: List of nodes participating in election
+            nodes: List of nodes participating in election (ignored in favour of
+                the tracked requesting nodes once nodes are registered)
             timestamp: Current timestamp
             
         Returns:
@@ -91,16 +227,26 @@ class LeaderElection:
             return self.current_leader, self.leader_timeout
             
         # Find eligible nodes
-        eligible_nodes = [node for node in nodes if self.is_eligible_leader(node)]
+        candidates = self._requesting if self.node_by_id else nodes
+        eligible_nodes = None
+        if self._channel_table is not None:
+            eligible_nodes = self._eligible_from_table(candidates)
+        if eligible_nodes is None:
+            eligible_nodes = [node for node in candidates if self.is_eligible_leader(node)]
         if not eligible_nodes:
             return None, timestamp
             
-        # Compute hashes for eligible nodes
-        node_hashes = [(node, self.compute_hash(node.id, timestamp)) 
-                      for node in eligible_nodes]
+        # Compute hashes for eligible nodes from one timestamp-seeded context;
+        # big-endian digests order the same way as their integer values
+        base = self._timestamp_hasher(timestamp)
+        node_hashes = []
+        for node in eligible_nodes:
+            h = base.copy()
+            h.update(node.id_bytes)
+            node_hashes.append((node, h.digest()))
         
         # Select node with highest hash
-        leader_node, _ = max(node_hashes, key=lambda x: x[1])
+        leader_node, _ = max(node_hashes, key=itemgetter(1))
         
         # Update leader state
         self.current_leader = leader_node
@@ -141,7 +287,10 @@ class LeaderElection:
         hash_value = announcement["hash"]
         
         # Find leader node
-        leader_node = next((node for node in nodes if node.id == leader_id), None)
+        if self.node_by_id:
+            leader_node = self.node_by_id.get(leader_id)
+        else:
+            leader_node = next((node for node in nodes if node.id == leader_id), None)
         if leader_node is None:
             return False
             
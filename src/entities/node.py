@@ -2,25 +2,111 @@
 Node class for the DEBAL system.
 """
 
+import logging
+from types import MappingProxyType
 import numpy as np
+from src.entities import _kernels
 from src.learning.pytorch_soft_actor_critic.replay_memory import ReplayMemory
 from src.learning.pytorch_soft_actor_critic.sac import SAC
 from src.learning.pytorch_soft_actor_critic.utils import get_action
 
+logger = logging.getLogger(__name__)
+
+# Element type of the per-channel balance arrays. Balances are whole satoshis
+# in the network data, but rebalancing targets (e.g. 50% of capacity) produce
+# fractional amounts, so integer storage would truncate them; float64 holds
+# every integer amount below 2**53 exactly.
+BALANCE_DTYPE = np.float64
+
+class BalanceHistory:
+    """
+    Balance history of one channel stored as rows of (time, local_balance, remote_balance)
+    in a preallocated float64 array.
+    
+    Without a capacity the buffer doubles when full and keeps every record. With a
+    capacity it is a ring buffer that keeps the most recent `capacity` records.
+    """
+    
+    def __init__(self, capacity: int = None, initial_size: int = 64):
+        """
+        Initialize an empty history.
+        
+        Args:
+            capacity: Maximum number of records to keep (None keeps all)
+            initial_size: Initial number of rows when growing without a capacity
+        """
+        self.capacity = capacity
+        self._buf = np.empty((capacity or initial_size, 3), dtype=np.float64)
+        self._count = 0           # records written so far
+        self.last_time = None     # latest timestamp recorded
+        
+    def append(self, time: float, local_balance: float, remote_balance: float):
+        """Record a balance snapshot."""
+        i = self._count
+        if self.capacity is not None:
+            i %= self.capacity
+        elif i == len(self._buf):
+            self._buf = np.concatenate([self._buf, np.empty_like(self._buf)])
+        self._buf[i] = (time, local_balance, remote_balance)
+        self._count += 1
+        if self.last_time is None or time > self.last_time:
+            self.last_time = time
+            
+    def next_time(self) -> float:
+        """Timestamp to use when no simulation clock is available."""
+        return 0 if self.last_time is None else self.last_time + 1
+        
+    def __len__(self) -> int:
+        return self._count if self.capacity is None else min(self._count, self.capacity)
+        
+    def to_array(self) -> np.ndarray:
+        """Return the kept records in chronological order as an (n, 3) array."""
+        if self.capacity is None or self._count <= self.capacity:
+            return self._buf[:len(self)]
+        split = self._count % self.capacity
+        return np.concatenate([self._buf[split:], self._buf[:split]])
+
 class Node:
-    def __init__(self, node_id: str):
+    _DECISION_MESSAGES = {
+        1: "Channel imbalance detected",
+        2: "Low local balance detected",
+        3: "Low remote balance detected"
+    }
+    
+    def __init__(self, node_id: str, history_capacity: int = None, idx: int = None):
         """
         Initialize a node in the payment channel network.
         
         Args:
             node_id: Unique identifier for the node
+            history_capacity: Records kept per channel balance history (None keeps all)
+            idx: Integer index of the node in network-wide arrays (assigned by DEBALManager)
         """
         self.id = node_id
+        self.idx = idx
+        self._rebalancing_requested = False
+        self._request_listeners = []  # called with (node, requested) when rebalancing_requested changes
+        self.id_bytes = f"{node_id}".encode('utf-8')  # Hashed in leader elections
         self.local_balances = {}  # {neighbor_id: balance}
         self.remote_balances = {}  # {neighbor_id: balance}
         self.capacities = {}      # {neighbor_id: capacity}
-        self.fee_rates = {}       # {neighbor_id: fee_rate}
-        self.balance_history = {} # {neighbor_id: [(time, local_balance, remote_balance)]}
+        self._fee_rates = {}      # {neighbor_id: fee_rate}, written through set_fee_rate
+        self._fee_rates_view = MappingProxyType(self._fee_rates)
+        self._mean_fee = None     # cached mean of fee_rates, None when stale
+        self.balance_history = {} # {neighbor_id: BalanceHistory}
+        self.history_capacity = history_capacity
+        
+        # Parallel per-channel arrays mirroring the balance dicts (one slot per channel)
+        self._slot = {}           # {neighbor_id: slot}
+        self._channel_ids = []    # neighbor ids in slot order
+        self._synced = None       # dicts the arrays were last built from
+        self._balance_callback = None  # called after every balance or channel change
+        self._balance_version = 0 # bumped whenever any channel balance or capacity changes
+        self._eligible_cache = (None, False)  # (version key, eligibility) memo for leader election
+        self._thresholds = None   # (kappa, theta, kappa*capacity, theta*capacity) per channel
+        self._skew_cache = (None, None)  # (balance version, skewness per channel)
+        self._state_buf = np.empty(4, dtype=np.float64)  # reused by _fill_state
+        self._rebuild_arrays()
         
         # Initialize DRL agent
         self.replay_memory = ReplayMemory(1000000)
@@ -37,6 +123,128 @@ class Node:
         self.rebalancing_requested = False
         self.needs_rebalancing = False
         
+    def _arrays_current(self) -> bool:
+        """Check whether the channel arrays were built from the current balance dicts."""
+        synced = self._synced
+        return (synced is not None and
+                synced[0] is self.local_balances and
+                synced[1] is self.remote_balances and
+                synced[2] is self.capacities)
+        
+    def _rebuild_arrays(self):
+        """Rebuild the per-channel arrays from the balance dicts."""
+        channels = list(self.capacities)
+        n = len(channels)
+        self._slot = {channel_id: i for i, channel_id in enumerate(channels)}
+        self._channel_ids = channels
+        self._local_arr = np.fromiter((self.local_balances.get(c, 0.0) for c in channels), BALANCE_DTYPE, n)
+        self._remote_arr = np.fromiter((self.remote_balances.get(c, 0.0) for c in channels), BALANCE_DTYPE, n)
+        self._cap_arr = np.fromiter((self.capacities[c] for c in channels), BALANCE_DTYPE, n)
+        self._total_local = sum(self.local_balances.values())
+        self._total_remote = sum(self.remote_balances.values())
+        self._synced = (self.local_balances, self.remote_balances, self.capacities)
+        self._balance_version += 1
+        self._thresholds = None
+        self._inv_cap_LR = (1.0 / self.capacities.get("L", 1), 1.0 / self.capacities.get("R", 1))
+        if self._balance_callback is not None:
+            self._balance_callback()
+        
+    def _bind_arrays(self, local: np.ndarray, remote: np.ndarray, cap: np.ndarray):
+        """
+        Move the channel arrays into caller-owned buffers (e.g. slices of a
+        network-wide table), so balance writes land there directly.
+        """
+        if not self._arrays_current():
+            self._rebuild_arrays()
+        local[:] = self._local_arr
+        remote[:] = self._remote_arr
+        cap[:] = self._cap_arr
+        self._local_arr, self._remote_arr, self._cap_arr = local, remote, cap
+        
+    @property
+    def fee_rates(self):
+        """Read-only view of the fee rates; set_fee_rate keeps the cached mean fee in step."""
+        return self._fee_rates_view
+        
+    @property
+    def balance_version(self) -> int:
+        """Counter that changes whenever the node's balances or channels change."""
+        if not self._arrays_current():
+            self._rebuild_arrays()
+        return self._balance_version
+        
+    @property
+    def skewness_arr(self) -> np.ndarray:
+        """
+        Skewness |local - remote| / capacity of all channels, in slot order.
+        
+        Computed once per balance version, so repeated reads between balance
+        changes share one array. Callers must not modify it.
+        """
+        version = self.balance_version
+        cached_version, skewness = self._skew_cache
+        if cached_version != version:
+            skewness = np.abs(self._local_arr - self._remote_arr) / self._cap_arr
+            self._skew_cache = (version, skewness)
+        return skewness
+        
+    def channel_thresholds(self, kappa: float, theta: float):
+        """
+        Per-channel leader thresholds kappa*capacity and theta*capacity.
+        
+        Computed once per (kappa, theta) and reused until the channels change.
+        
+        Returns:
+            Tuple of arrays (kappa_cap, theta_cap), in slot order
+        """
+        cap = self.cap_arr
+        cached = self._thresholds
+        if cached is None or cached[0] != kappa or cached[1] != theta:
+            cached = self._thresholds = (kappa, theta, kappa * cap, theta * cap)
+        return cached[2], cached[3]
+        
+    @property
+    def local_arr(self) -> np.ndarray:
+        """Local balances of all channels, in slot order."""
+        if not self._arrays_current():
+            self._rebuild_arrays()
+        return self._local_arr
+        
+    @property
+    def remote_arr(self) -> np.ndarray:
+        """Remote balances of all channels, in slot order."""
+        if not self._arrays_current():
+            self._rebuild_arrays()
+        return self._remote_arr
+        
+    @property
+    def cap_arr(self) -> np.ndarray:
+        """Capacities of all channels, in slot order."""
+        if not self._arrays_current():
+            self._rebuild_arrays()
+        return self._cap_arr
+        
+    @property
+    def channel_ids(self) -> list:
+        """Channel (neighbor) ids, in slot order."""
+        if not self._arrays_current():
+            self._rebuild_arrays()
+        return self._channel_ids
+        
+    def _write_balances(self, channel_id: str, new_local: float, new_remote: float):
+        """Store new balances for a channel in the dicts, the arrays and the running totals."""
+        if self._arrays_current():
+            self._total_local += new_local - self.local_balances.get(channel_id, 0.0)
+            self._total_remote += new_remote - self.remote_balances.get(channel_id, 0.0)
+            slot = self._slot[channel_id]
+            self._local_arr[slot] = new_local
+            self._remote_arr[slot] = new_remote
+        self.local_balances[channel_id] = new_local
+        self.remote_balances[channel_id] = new_remote
+        self._balance_version += 1
+        if self._balance_callback is not None:
+            self._balance_callback()
+        
     def get_balance_ratio(self, channel_id: str) -> float:
         """
         Calculate the balance ratio for a channel.
@@ -75,7 +283,9 @@ class Node:
         Returns:
             float: Sum of local balances
         """
-        return sum(self.local_balances.values())
+        if not self._arrays_current():
+            self._rebuild_arrays()
+        return self._total_local
         
     def get_total_incoming_liquidity(self) -> float:
         """
@@ -84,8 +294,21 @@ class Node:
         Returns:
             float: Sum of remote balances
         """
-        return sum(self.remote_balances.values())
-        
+        if not self._arrays_current():
+            self._rebuild_arrays()
+        return self._total_remote
+        
+    @property
+    def rebalancing_requested(self) -> bool:
+        """Whether this node has requested rebalancing."""
+        return self._rebalancing_requested
+        
+    @rebalancing_requested.setter
+    def rebalancing_requested(self, requested: bool):
+        self._rebalancing_requested = requested
+        for listener in self._request_listeners:
+            listener(self, requested)
+            
     def request_rebalancing(self):
         """Request rebalancing for this node."""
         self.rebalancing_requested = True
@@ -106,29 +329,53 @@ class Node:
         Returns:
             bool: True if update successful, False otherwise
         """
-        if channel_id not in self.capacities:
+        capacity = self.capacities.get(channel_id)
+        if capacity is None:
             return False
             
-        new_local = self.local_balances[channel_id] + local_delta
-        new_remote = self.remote_balances[channel_id] + remote_delta
+        local_balances = self.local_balances
+        remote_balances = self.remote_balances
+        old_local = local_balances[channel_id]
+        old_remote = remote_balances[channel_id]
+        new_local = old_local + local_delta
+        new_remote = old_remote + remote_delta
         
         # Check capacity constraints
         if new_local < 0 or new_remote < 0:
             return False
-        if new_local + new_remote > self.capacities[channel_id]:
+        if new_local + new_remote > capacity:
             return False
             
-        self.local_balances[channel_id] = new_local
-        self.remote_balances[channel_id] = new_remote
+        # Same as _write_balances, inlined since this runs on every payment hop
+        synced = self._synced
+        if (synced is not None and synced[0] is local_balances and
+                synced[1] is remote_balances and synced[2] is self.capacities):
+            slot = self._slot[channel_id]
+            self._local_arr[slot] = new_local
+            self._remote_arr[slot] = new_remote
+            self._total_local += new_local - old_local
+            self._total_remote += new_remote - old_remote
+        local_balances[channel_id] = new_local
+        remote_balances[channel_id] = new_remote
+        self._balance_version += 1
+        if self._balance_callback is not None:
+            self._balance_callback()
         
         # Record balance change in history
+        self._record_history(channel_id, new_local, new_remote)
+        
+        return True
+        
+    def _record_history(self, channel_id: str, new_local: float, new_remote: float):
+        """Append the new balances of a channel to its history."""
+        history = self.balance_history.get(channel_id)
+        if history is None:
+            history = self.balance_history[channel_id] = BalanceHistory(self.history_capacity)
         if hasattr(self, 'env'):  # Check if we have access to simulation environment
             current_time = self.env.now
         else:
-            current_time = max(t for t, _, _ in self.balance_history[channel_id]) + 1 if self.balance_history[channel_id] else 0
-        self.balance_history[channel_id].append((current_time, new_local, new_remote))
-        
-        return True
+            current_time = history.next_time()
+        history.append(current_time, new_local, new_remote)
         
     def add_channel(self, channel_id: str, local_balance: float, remote_balance: float, capacity: float):
         """
@@ -144,7 +391,21 @@ class Node:
         self.remote_balances[channel_id] = remote_balance
         self.capacities[channel_id] = capacity
         # Initialize balance history with initial balances at time 0
-        self.balance_history[channel_id] = [(0, local_balance, remote_balance)]
+        history = BalanceHistory(self.history_capacity)
+        history.append(0, local_balance, remote_balance)
+        self.balance_history[channel_id] = history
+        self._rebuild_arrays()
+        
+    def set_fee_rate(self, channel_id: str, fee_rate: float):
+        """
+        Set the fee rate of a channel.
+        
+        Args:
+            channel_id: Channel identifier
+            fee_rate: Proportional fee rate
+        """
+        self._fee_rates[channel_id] = fee_rate
+        self._mean_fee = None
         
     def remove_channel(self, channel_id: str):
         """
@@ -159,10 +420,12 @@ class Node:
             del self.remote_balances[channel_id]
         if channel_id in self.capacities:
             del self.capacities[channel_id]
-        if channel_id in self.fee_rates:
-            del self.fee_rates[channel_id]
+        if channel_id in self._fee_rates:
+            del self._fee_rates[channel_id]
+            self._mean_fee = None
         if channel_id in self.balance_history:
             del self.balance_history[channel_id]
+        self._rebuild_arrays()
             
     def set_leader(self, leader_id: str, timestamp: float):
         """
@@ -212,22 +475,28 @@ class Node:
         Returns:
             np.ndarray: State vector [local_balance_L, local_balance_R, remote_balance_L, remote_balance_R]
         """
-        # Get channel states
-        local_L = self.local_balances.get("L", 0)
-        local_R = self.local_balances.get("R", 0)
-        remote_L = self.remote_balances.get("L", 0)
-        remote_R = self.remote_balances.get("R", 0)
+        return self._fill_state().copy()
         
-        # Normalize by capacities
-        capacity_L = self.capacities.get("L", 1)
-        capacity_R = self.capacities.get("R", 1)
+    def _fill_state(self) -> np.ndarray:
+        """
+        Write the DEBAL state vector into the node's shared state buffer.
         
-        return np.array([
-            local_L / capacity_L,
-            local_R / capacity_R,
-            remote_L / capacity_L,
-            remote_R / capacity_R
-        ])
+        The buffer is overwritten on every call; callers that keep the state
+        must copy it (get_state does).
+        """
+        if not self._arrays_current():
+            self._rebuild_arrays()
+        inv_L, inv_R = self._inv_cap_LR
+        local = self.local_balances
+        remote = self.remote_balances
+        
+        # Channel balances normalized by capacities
+        buf = self._state_buf
+        buf[0] = local.get("L", 0) * inv_L
+        buf[1] = local.get("R", 0) * inv_R
+        buf[2] = remote.get("L", 0) * inv_L
+        buf[3] = remote.get("R", 0) * inv_R
+        return buf
         
     def decide_rebalancing(self) -> bool:
         """
@@ -236,73 +505,29 @@ class Node:
         Returns:
             bool: True if rebalancing is needed, False otherwise
         """
-        state = self.get_state()
-        
-        # Get current channel states
-        local_L_ratio = state[0]
-        local_R_ratio = state[1]
-        remote_L_ratio = state[2]
-        remote_R_ratio = state[3]
-        
-        # Calculate imbalance metrics
-        L_imbalance = abs(local_L_ratio - remote_L_ratio)
-        R_imbalance = abs(local_R_ratio - remote_R_ratio)
-        
-        # Print current state for debugging
-        if hasattr(self, 'env') and hasattr(self.env, 'now'):
-            print(f"\nTime {self.env.now}: Checking rebalancing")
-            print(f"Channel L: Local={self.local_balances['L']}, Remote={self.remote_balances['L']}, Imbalance={L_imbalance:.2f}")
-            print(f"Channel R: Local={self.local_balances['R']}, Remote={self.remote_balances['R']}, Imbalance={R_imbalance:.2f}")
-        
-        # DEBAL decision criteria
-        # 1. Check if any channel is significantly imbalanced (>20% difference)
-        if L_imbalance > 0.2 or R_imbalance > 0.2:
-            if hasattr(self, 'env') and hasattr(self.env, 'now'):
-                print(f"Time {self.env.now}: Channel imbalance detected")
-            # Calculate rebalancing amount
-            if L_imbalance > R_imbalance:
-                # Rebalance L channel
-                target_balance = (self.capacities["L"] * 0.5)  # Target 50% balance
-                rebalance_amount = target_balance - self.local_balances["L"]
-                self.perform_rebalancing("L", rebalance_amount)
-            else:
-                # Rebalance R channel
-                target_balance = (self.capacities["R"] * 0.5)  # Target 50% balance
-                rebalance_amount = target_balance - self.local_balances["R"]
-                self.perform_rebalancing("R", rebalance_amount)
-            return True
-            
-        # 2. Check if local balances are too low (<30% of capacity)
-        if local_L_ratio < 0.3 or local_R_ratio < 0.3:
-            if hasattr(self, 'env') and hasattr(self.env, 'now'):
-                print(f"Time {self.env.now}: Low local balance detected")
-            # Rebalance the channel with lower local balance
-            if local_L_ratio < local_R_ratio:
-                target_balance = (self.capacities["L"] * 0.4)  # Target 40% balance
-                rebalance_amount = target_balance - self.local_balances["L"]
-                self.perform_rebalancing("L", rebalance_amount)
-            else:
-                target_balance = (self.capacities["R"] * 0.4)  # Target 40% balance
-                rebalance_amount = target_balance - self.local_balances["R"]
-                self.perform_rebalancing("R", rebalance_amount)
-            return True
-            
-        # 3. Check if remote balances are too low (<30% of capacity)
-        if remote_L_ratio < 0.3 or remote_R_ratio < 0.3:
-            if hasattr(self, 'env') and hasattr(self.env, 'now'):
-                print(f"Time {self.env.now}: Low remote balance detected")
-            # Rebalance the channel with lower remote balance
-            if remote_L_ratio < remote_R_ratio:
-                target_balance = (self.capacities["L"] * 0.6)  # Target 60% balance
-                rebalance_amount = target_balance - self.local_balances["L"]
-                self.perform_rebalancing("L", rebalance_amount)
-            else:
-                target_balance = (self.capacities["R"] * 0.6)  # Target 60% balance
-                rebalance_amount = target_balance - self.local_balances["R"]
-                self.perform_rebalancing("R", rebalance_amount)
-            return True
+        state = self._fill_state()
+        rule, channel, rebalance_amount = _kernels.decide_rebalancing(
+            state,
+            # Passed as floats so the kernel is compiled once, whatever the balance types
+            float(self.capacities.get("L", 1)), float(self.capacities.get("R", 1)),
+            float(self.local_balances.get("L", 0)), float(self.local_balances.get("R", 0))
+        )
+        
+        # Log current state for debugging
+        if logger.isEnabledFor(logging.DEBUG) and hasattr(self, 'env') and hasattr(self.env, 'now'):
+            logger.debug("Time %s: Checking rebalancing", self.env.now)
+            logger.debug("Channel L: Local=%s, Remote=%s, Imbalance=%.2f",
+                         self.local_balances['L'], self.remote_balances['L'], abs(state[0] - state[2]))
+            logger.debug("Channel R: Local=%s, Remote=%s, Imbalance=%.2f",
+                         self.local_balances['R'], self.remote_balances['R'], abs(state[1] - state[3]))
+            if rule:
+                logger.debug("Time %s: %s", self.env.now, self._DECISION_MESSAGES[rule])
+        
+        if not rule:
+            return False
             
-        return False
+        self.perform_rebalancing("L" if channel == 0 else "R", rebalance_amount)
+        return True
         
     def perform_rebalancing(self, channel_id: str, amount: float):
         """
@@ -315,28 +540,20 @@ class Node:
         if channel_id not in self.capacities:
             return
             
-        # Calculate new balances
-        new_local = self.local_balances[channel_id] + amount
-        new_remote = self.remote_balances[channel_id] - amount
-        
-        # Ensure balances stay within capacity
-        if new_local < 0:
-            new_local = 0
-            new_remote = self.capacities[channel_id]
-        elif new_local > self.capacities[channel_id]:
-            new_local = self.capacities[channel_id]
-            new_remote = 0
+        # Calculate new balances, clamped to [0, capacity]
+        capacity = self.capacities[channel_id]
+        new_local = min(max(self.local_balances[channel_id] + amount, 0.0), capacity)
+        new_remote = min(max(self.remote_balances[channel_id] - amount, 0.0), capacity)
+        
+        # Keep local + remote within capacity
+        if new_local + new_remote > capacity:
+            new_remote = capacity - new_local
             
         # Update balances
-        self.local_balances[channel_id] = new_local
-        self.remote_balances[channel_id] = new_remote
+        self._write_balances(channel_id, new_local, new_remote)
         
         # Record in history
-        if hasattr(self, 'env'):
-            current_time = self.env.now
-        else:
-            current_time = max(t for t, _, _ in self.balance_history[channel_id]) + 1 if self.balance_history[channel_id] else 0
-        self.balance_history[channel_id].append((current_time, new_local, new_remote))
+        self._record_history(channel_id, new_local, new_remote)
 
     def _calculate_reward(self, state: np.ndarray, action: float, 
                          next_state: np.ndarray) -> float:
@@ -351,17 +568,10 @@ class Node:
         Returns:
             float: Reward value
         """
-        # Calculate current and next imbalance
-        current_imbalance = abs(state[0] - state[1]) + abs(state[2] - state[3])
-        next_imbalance = abs(next_state[0] - next_state[1]) + abs(next_state[2] - next_state[3])
-        
-        # Reward based on imbalance reduction
-        imbalance_improvement = current_imbalance - next_imbalance
-        
-        # Penalty for rebalancing cost
-        rebalancing_cost = abs(action) * np.mean(list(self.fee_rates.values()))
-        
-        return imbalance_improvement - rebalancing_cost
+        # Reward based on imbalance reduction, minus a penalty for rebalancing cost
+        if self._mean_fee is None:
+            self._mean_fee = np.mean(list(self.fee_rates.values()))
+        return _kernels.rebalancing_reward(state, float(action), next_state, float(self._mean_fee))
 
     def get_balance_history(self, channel_id: str = None):
         """
@@ -371,8 +581,10 @@ class Node:
             channel_id: Channel identifier (optional)
             
         Returns:
-            dict: Balance history for specified channel or all channels
+            Array of (time, local_balance, remote_balance) rows for the specified
+            channel, or a dict of such arrays for all channels
         """
         if channel_id is not None:
-            return self.balance_history.get(channel_id, [])
-        return self.balance_history
+            history = self.balance_history.get(channel_id)
+            return history.to_array() if history is not None else np.empty((0, 3))
+        return {cid: history.to_array() for cid, history in self.balance_history.items()}
@@ -4,9 +4,13 @@ Rebalancing engine module for DEBAL.
 
 from typing import List, Dict, Optional, Tuple
 import networkx as nx
+import numpy as np
+from ._kernels import hop_feasibility, transfer_scores
 from .node import Node
 
 class RebalancingEngine:
+    __slots__ = ('sigma', 'nodes', '_channel_table', '_edge_of')
+    
     def __init__(self, sigma: float = 0.1):
         """
         Initialize the rebalancing engine.
@@ -16,6 +20,22 @@ class RebalancingEngine:
         """
         self.sigma = sigma
         self.nodes = {}  # Will be initialized by scheduler
+        self._channel_table = None  # optional shared (3, E) capacity/local/remote table
+        self._edge_of = {}          # {(node_id, neighbor_id): column in the channel table}
+        
+    def bind_channel_table(self, table: np.ndarray, edge_of: Dict[Tuple[str, str], int]):
+        """
+        Use a shared channel table for batched path checks.
+        
+        The owner of the table keeps it in sync with the nodes' balances and
+        rebinds it whenever the channel layout changes.
+        
+        Args:
+            table: (3, E) array of capacities, local and remote balances
+            edge_of: Column of each (node_id, neighbor_id) channel in the table
+        """
+        self._channel_table = table
+        self._edge_of = edge_of
         
     def validate_path(self, path: List[str], amount: float) -> bool:
         """
@@ -47,33 +67,67 @@ class RebalancingEngine:
             if next_node_id not in node.local_balances:
                 return False
                 
-            # Get current balances and capacity
-            local_balance = node.local_balances[next_node_id]
-            remote_balance = node.remote_balances[next_node_id]
-            capacity = node.capacities[next_node_id]
-            
-            # Check if sufficient balance for transfer
-            if local_balance < amount:
+            # Check balances and skewness of the hop's channel after the transfer
+            if not hop_feasibility(float(node.capacities[next_node_id]),
+                                   float(node.local_balances[next_node_id]),
+                                   float(node.remote_balances[next_node_id]),
+                                   float(amount), self.sigma):
                 return False
                 
-            # Calculate new balances after transfer
-            new_local = local_balance - amount
-            new_remote = remote_balance + amount
+        return True
+        
+    def validate_hops(self, local: np.ndarray, remote: np.ndarray,
+                      capacity: np.ndarray, amount: float) -> np.ndarray:
+        """
+        Vectorized form of the per-hop balance checks in `validate_path`.
+        
+        Args:
+            local: Local balance of each hop's channel
+            remote: Remote balance of each hop's channel
+            capacity: Capacity of each hop's channel
+            amount: Amount to transfer
             
-            # Check minimum balance requirements (20% of capacity)
-            min_balance = 0.2 * capacity
-            if new_local < min_balance or new_remote < min_balance:
-                return False
-                
-            # Calculate skewness before and after transfer
-            current_skew = abs(local_balance - remote_balance) / capacity
-            new_skew = abs(new_local - new_remote) / capacity
+        Returns:
+            np.ndarray: Boolean mask, True where the hop can carry the transfer
+        """
+        return hop_feasibility(capacity, local, remote, float(amount), self.sigma)
+        
+    def feasible_paths(self, paths: List[List[str]], amount: float) -> List[List[str]]:
+        """
+        Filter candidate paths with one vectorized balance check over all their hops.
+        
+        Single paths are short, so `validate_path` checks them hop by hop; the
+        channel table pays off when many paths are checked together.
+        
+        Args:
+            paths: Candidate paths as lists of node IDs
+            amount: Amount to transfer
             
-            # Check if new skewness exceeds threshold or makes imbalance worse
-            if new_skew > self.sigma and new_skew >= current_skew:
-                return False
-                
-        return True
+        Returns:
+            The paths that pass `validate_path`, in input order
+        """
+        if self._channel_table is None:
+            return [path for path in paths if self.validate_path(path, amount)]
+            
+        # Map each path to its channel-table columns; drop paths with missing channels
+        candidates = []
+        hop_rows = []
+        for path in paths:
+            rows = [self._edge_of.get(hop) for hop in zip(path, path[1:])]
+            if rows and None not in rows:
+                candidates.append(path)
+                hop_rows.append(rows)
+        if not candidates:
+            return []
+            
+        # Check all hops at once, then require every hop of a path to pass
+        lengths = np.fromiter((len(rows) for rows in hop_rows), np.int64, len(hop_rows))
+        capacity, local, remote = self._channel_table[:, np.concatenate(hop_rows)]
+        hop_ok = self.validate_hops(local, remote, capacity, amount)
+        starts = np.zeros(len(lengths), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        path_ok = np.logical_and.reduceat(hop_ok, starts)
+        return [path for path, ok in zip(candidates, path_ok) if ok]
         
     def execute_transfer(self, path: List[str], amount: float) -> bool:
         """
@@ -89,25 +143,122 @@ class RebalancingEngine:
         if not self.validate_path(path, amount):
             return False
             
-        # Update balances along the path
-        for i in range(len(path) - 1):
-            node_id = path[i]
-            next_node_id = path[i + 1]
-            
-            # Get nodes
-            node = self.nodes[node_id]
-            next_node = self.nodes[next_node_id]
+        return self.commit_transfer(path, amount)
+        
+    def commit_transfer(self, path: List[str], amount: float) -> bool:
+        """
+        Move an amount along a path that has already been validated.
+        
+        For callers that checked the path themselves, e.g. through
+        `feasible_paths`, so the hops are not validated a second time.
+        
+        Args:
+            path: List of node IDs in the path
+            amount: Amount to transfer
             
-            # Update local balances
-            node.local_balances[next_node_id] -= amount
-            next_node.local_balances[node_id] += amount
+        Returns:
+            bool: True if the transfer was applied, False if a channel end is
+                missing or a balance update was rejected (nothing is moved then)
+        """
+        hops = self._channel_hops(path)
+        return hops is not None and self._move_along(hops, amount)
+        
+    def _channel_hops(self, path: List[str]) -> Optional[List[Tuple[Node, Node]]]:
+        """
+        Resolve a path into its (node, next_node) hops.
+        
+        Args:
+            path: List of node IDs in the path
             
-            # Update remote balances
-            node.remote_balances[next_node_id] += amount
-            next_node.remote_balances[node_id] -= amount
+        Returns:
+            The hops, or None if a node or either end of a hop's channel is missing
+        """
+        nodes = self.nodes
+        hops = []
+        for node_id, next_node_id in zip(path, path[1:]):
+            node = nodes.get(node_id)
+            next_node = nodes.get(next_node_id)
+            if (node is None or next_node is None or
+                    next_node_id not in node.local_balances or node_id not in next_node.local_balances):
+                return None
+            hops.append((node, next_node))
+        return hops
+        
+    def _move_along(self, hops: List[Tuple[Node, Node]], amount: float) -> bool:
+        """
+        Update both ends of every hop's channel for a transfer of the amount.
+        
+        If a node rejects an update, the updates already made are undone, so
+        the transfer is applied either completely or not at all.
+        
+        Args:
+            hops: (node, next_node) pairs from `_channel_hops`
+            amount: Amount to transfer
             
+        Returns:
+            bool: True if every update was accepted
+        """
+        applied = []
+        for node, next_node in hops:
+            for owner, peer, delta in ((node, next_node, -amount), (next_node, node, amount)):
+                if not owner.update_balances(peer.id, delta, -delta):
+                    for done_owner, done_peer, done_delta in reversed(applied):
+                        done_owner.update_balances(done_peer.id, -done_delta, done_delta)
+                    return False
+                applied.append((owner, peer, delta))
         return True
         
+    def try_transfer_multi(self, path: List[str], amounts: List[float]) -> Tuple[float, float]:
+        """
+        Execute the first of several candidate amounts that is feasible and improves the balances.
+        
+        The path's channels are gathered once and every amount is checked
+        and scored together in one kernel call.
+        
+        Args:
+            path: List of node IDs in the path
+            amounts: Candidate amounts, in order of preference
+            
+        Returns:
+            Tuple of (amount, improvement) of the executed transfer, or
+            (0.0, 0.0) if no amount is feasible and improves the balances
+        """
+        if len(path) < 2 or not len(amounts):
+            return 0.0, 0.0
+            
+        # Gather capacity, local and remote balance of each hop's channel
+        hops = self._channel_hops(path)
+        if hops is None:
+            return 0.0, 0.0
+        channels = np.empty((3, len(hops)), dtype=np.float64)
+        for i, (node, next_node) in enumerate(hops):
+            channels[:, i] = (node.capacities[next_node.id],
+                              node.local_balances[next_node.id],
+                              node.remote_balances[next_node.id])
+        capacity, local, remote = channels
+        
+        # No hop can carry more than its local balance: drop those amounts up front
+        amount_arr = np.asarray(amounts, dtype=np.float64)
+        candidates = np.flatnonzero(amount_arr <= local.min())
+        if not len(candidates):
+            return 0.0, 0.0
+            
+        # Feasibility and improvement of the remaining amounts at once
+        feasible, improvement = transfer_scores(capacity, local, remote,
+                                                amount_arr[candidates], self.sigma)
+        accepted = np.flatnonzero(feasible & (improvement > 0))
+        if not len(accepted):
+            return 0.0, 0.0
+            
+        # Commit the first accepted amount on both ends of every channel
+        k = candidates[accepted[0]]
+        improvement = improvement[accepted[0]]
+        amount = amounts[k]
+        if not self._move_along(hops, amount):
+            return 0.0, 0.0
+            
+        return amount, float(improvement)
+        
     def calculate_improvement(self, path: List[str], amount: float) -> float:
         """
         Calculate the liquidity improvement from a rebalancing operation.
@@ -122,37 +273,12 @@ class RebalancingEngine:
         if amount > 0 and not self.validate_path(path, amount):
             return 0.0
             
-        # Calculate initial balance ratios
-        initial_ratios = []
-        for i in range(len(path) - 1):
-            node_id = path[i]
-            next_node_id = path[i + 1]
-            
+        # Sum of |local - remote| / capacity over the hops, before minus after the transfer
+        improvement = 0.0
+        for node_id, next_node_id in zip(path, path[1:]):
             node = self.nodes[node_id]
-            next_node = self.nodes[next_node_id]
-            
-            local = node.local_balances[next_node_id]
-            remote = node.remote_balances[next_node_id]
+            imbalance = node.local_balances[next_node_id] - node.remote_balances[next_node_id]
             capacity = node.capacities[next_node_id]
+            improvement += (abs(imbalance) - abs(imbalance - 2 * amount)) / capacity
             
-            ratio = abs(local - remote) / capacity
-            initial_ratios.append(ratio)
-            
-        # Calculate final balance ratios after transfer
-        final_ratios = []
-        for i in range(len(path) - 1):
-            node_id = path[i]
-            next_node_id = path[i + 1]
-            
-            node = self.nodes[node_id]
-            next_node = self.nodes[next_node_id]
-            
-            local = node.local_balances[next_node_id] - amount
-            remote = node.remote_balances[next_node_id] + amount
-            capacity = node.capacities[next_node_id]
-            
-            ratio = abs(local - remote) / capacity
-            final_ratios.append(ratio)
-            
-        # Return improvement in balance ratios
-        return sum(initial_ratios) - sum(final_ratios) 
\ No newline at end of file
+        return improvement
@@ -2,14 +2,24 @@
 Rebalancing scheduler module for DEBAL.
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, FrozenSet
+from itertools import islice
+import logging
+import queue
 import time
 import threading
-from src.entities.Node import Node
+import networkx as nx
+import numpy as np
+from src.entities.node import Node
 from src.entities.leader_election import LeaderElection
 from src.entities.rebalancing_engine import RebalancingEngine
 
+logger = logging.getLogger(__name__)
+
 class RebalancingScheduler:
+    __slots__ = ('nodes', 'node_by_id', '_node_pos', 'leader_election', 'rebalancing_engine', 'interval',
+                 'running', 'scheduler_thread', 'state_changed', '_request_q', '_retry')
+    
     def __init__(self, 
                  nodes: List[Node],
                  leader_election: LeaderElection,
@@ -25,11 +35,16 @@ class RebalancingScheduler:
             interval: Time between rebalancing attempts in seconds
         """
         self.nodes = nodes
+        self.node_by_id = {node.id: node for node in nodes}
+        self._node_pos = {node.id: i for i, node in enumerate(nodes)}  # position in self.nodes
         self.leader_election = leader_election
         self.rebalancing_engine = rebalancing_engine
         self.interval = interval
         self.running = False
         self.scheduler_thread = None
+        self.state_changed = threading.Event()  # set after every election or served request
+        self._request_q = queue.Queue()  # nodes waiting to be rebalanced
+        self._retry = []  # requests that could not be served yet
         
     def start(self):
         """Start the rebalancing scheduler."""
@@ -39,6 +54,16 @@ class RebalancingScheduler:
             self.scheduler_thread.daemon = True
             self.scheduler_thread.start()
             
+    def request_rebalancing(self, node: Node):
+        """
+        Queue a node for rebalancing.
+        
+        Args:
+            node: Node requesting rebalancing
+        """
+        node.needs_rebalancing = True
+        self._request_q.put(node)
+        
     def stop(self):
         """Stop the rebalancing scheduler."""
         self.running = False
@@ -46,30 +71,35 @@ class RebalancingScheduler:
             self.scheduler_thread.join()
             
     def _scheduler_loop(self):
-        """Main scheduler loop that periodically triggers rebalancing."""
+        """Main scheduler loop that serves rebalancing requests as they are queued."""
         while self.running:
             # Elect leader if needed
             if not self.leader_election.current_leader:
                 leader = self.leader_election.elect_leader(self.nodes)
                 if leader:
-                    print(f"Elected node {leader.id} as leader")
+                    logger.info("Elected node %s as leader", leader.id)
+                    self.state_changed.set()
                 else:
-                    print("Failed to elect leader")
+                    logger.info("Failed to elect leader")
                     time.sleep(self.interval)
                     continue
                     
-            # Get nodes requesting rebalancing
-            rebalancing_nodes = [node for node in self.nodes if node.needs_rebalancing]
-            
-            if not rebalancing_nodes:
-                time.sleep(self.interval)
+            # Wait for the next request instead of polling every node
+            try:
+                node = self._request_q.get(timeout=self.interval)
+            except queue.Empty:
+                # Retry requests that could not be served once per quiet interval
+                for node in self._retry:
+                    self._request_q.put(node)
+                self._retry.clear()
                 continue
                 
-            # Process rebalancing requests
-            for node in rebalancing_nodes:
+            # Process the rebalancing request unless it was already served
+            if node.needs_rebalancing:
                 self._process_rebalancing_request(node)
-                
-            time.sleep(self.interval)
+                if node.needs_rebalancing:
+                    self._retry.append(node)
+                self.state_changed.set()
             
     def _process_rebalancing_request(self, node: Node):
         """
@@ -82,29 +112,31 @@ class RebalancingScheduler:
         paths = self._find_rebalancing_paths(node)
         
         if not paths:
-            print(f"No valid paths found for node {node.id}")
+            logger.info("No valid paths found for node %s", node.id)
             return
             
-        print(f"Found {len(paths)} potential paths for node {node.id}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Found %d potential paths for node %s", len(paths), node.id)
             
         # Try rebalancing with different amounts
         amounts = [1000, 750, 500, 250, 100]  # More granular amounts
         
         for path in paths:
-            path_str = " -> ".join(str(n.id) for n in path)
-            print(f"Trying path: {path_str}")
+            if debug:
+                logger.debug("Trying path: %s", " -> ".join(str(n.id) for n in path))
             
-            for amount in amounts:
-                improvement = self.rebalancing_engine.calculate_improvement(path, amount)
-                print(f"  Amount {amount}: improvement {improvement}")
-                
-                if improvement > 0:
-                    if self.rebalancing_engine.execute_transfer(path, amount):
-                        print(f"Successfully rebalanced {amount} along path {path_str}")
-                        node.needs_rebalancing = False
-                        return
+            # All amounts are checked in one pass; the largest accepted one is executed
+            amount, improvement = self.rebalancing_engine.try_transfer_multi(
+                [n.id for n in path], amounts)
+            
+            if improvement > 0:
+                logger.info("Successfully rebalanced %s along path %s (improvement %s)",
+                            amount, " -> ".join(str(n.id) for n in path), improvement)
+                node.needs_rebalancing = False
+                return
                         
-        print(f"Failed to find a valid rebalancing for node {node.id}")
+        logger.info("Failed to find a valid rebalancing for node %s", node.id)
                         
     def _find_rebalancing_paths(self, node: Node, max_paths: int = 10) -> List[List[Node]]:
         """
@@ -118,110 +150,85 @@ class RebalancingScheduler:
             List[List[Node]]: List of potential rebalancing paths
         """
         paths = []
+        path_id_sets = []  # node ids of each path, built once for the uniqueness checks
+        graph = self._channel_graph()
         
-        # Find nodes with complementary imbalances
-        for other_node in self.nodes:
+        # Find nodes with complementary imbalances, comparing all ratios at once
+        ratios = self._imbalance_ratios()
+        own_ratio = ratios[self._node_pos[node.id]]
+        complementary = np.abs(ratios - own_ratio) > 0.2
+        for other_node, is_complementary in zip(self.nodes, complementary):
             if other_node == node:
                 continue
                 
             # Check if nodes have complementary imbalances
-            if self._has_complementary_imbalance(node, other_node):
-                # Try to find multiple paths between these nodes
-                for _ in range(3):  # Try to find up to 3 different paths
-                    path = self._find_path(node, other_node, paths)
-                    if path and len(path) <= 5:  # Limit path length
-                        paths.append(path)
+            if is_complementary:
+                # Take up to 3 sufficiently different paths among the shortest ones
+                found = 0
+                candidates = nx.shortest_simple_paths(graph, node.id, other_node.id)
+                try:
+                    for id_path in islice(candidates, max_paths):
+                        if len(id_path) > 5:  # Limit path length; later paths are no shorter
+                            break
+                        path = [self.node_by_id[node_id] for node_id in id_path]
+                        if self._is_unique_path(path, path_id_sets):
+                            paths.append(path)
+                            path_id_sets.append(frozenset(id_path))
+                            found += 1
+                            if found == 3:
+                                break
+                except nx.NetworkXNoPath:
+                    pass
                         
             if len(paths) >= max_paths:
                 break
                 
         return paths
         
-    def _has_complementary_imbalance(self, node1: Node, node2: Node) -> bool:
+    def _imbalance_ratios(self) -> np.ndarray:
         """
-        Check if two nodes have complementary imbalances.
+        Share of each node's total balance that is local, in `self.nodes` order.
         
-        Args:
-            node1: First node
-            node2: Second node
-            
-        Returns:
-            bool: True if nodes have complementary imbalances
+        Nodes without balances get NaN, which never counts as complementary.
         """
-        # Calculate total balances
-        node1_total_local = sum(node1.local_balances.values())
-        node1_total_remote = sum(node1.remote_balances.values())
-        node2_total_local = sum(node2.local_balances.values())
-        node2_total_remote = sum(node2.remote_balances.values())
-        
-        # Calculate imbalance ratios
-        node1_ratio = node1_total_local / (node1_total_local + node1_total_remote)
-        node2_ratio = node2_total_local / (node2_total_local + node2_total_remote)
-        
-        # Check if ratios are significantly different
-        return abs(node1_ratio - node2_ratio) > 0.2
-                
-    def _find_path(self, source: Node, target: Node, 
-                  existing_paths: List[List[Node]] = None) -> Optional[List[Node]]:
+        totals = np.array([(node.get_total_outgoing_liquidity(), node.get_total_incoming_liquidity())
+                           for node in self.nodes], dtype=np.float64).reshape(-1, 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return totals[:, 0] / totals.sum(axis=1)
+            
+    def _channel_graph(self) -> nx.DiGraph:
         """
-        Find a path between two nodes, avoiding existing paths if possible.
+        Directed graph of the channels between the scheduler's nodes.
         
-        Args:
-            source: Source node
-            target: Target node
-            existing_paths: List of paths to avoid
-            
         Returns:
-            Optional[List[Node]]: Path between nodes if found
+            nx.DiGraph: One edge per channel, from the node to its neighbor
         """
-        visited = {source}
-        queue = [(source, [source])]
-        
-        while queue:
-            node, path = queue.pop(0)
-            
-            # Get neighbors in random order to find different paths
-            neighbors = list(node.local_balances.keys())
-            import random
-            random.shuffle(neighbors)
-            
-            for neighbor_id in neighbors:
-                neighbor = next((n for n in self.nodes if n.id == neighbor_id), None)
-                
-                if not neighbor or neighbor in visited:
-                    continue
-                    
-                new_path = path + [neighbor]
-                
-                # Check if this path is significantly different from existing paths
-                if existing_paths and not self._is_unique_path(new_path, existing_paths):
-                    continue
-                    
-                if neighbor == target:
-                    return new_path
-                    
-                visited.add(neighbor)
-                queue.append((neighbor, new_path))
-                
-        return None
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.node_by_id)
+        graph.add_edges_from((node.id, neighbor_id)
+                             for node in self.nodes
+                             for neighbor_id in node.local_balances
+                             if neighbor_id in self.node_by_id)
+        return graph
         
     def _is_unique_path(self, new_path: List[Node], 
-                       existing_paths: List[List[Node]]) -> bool:
+                       existing_id_sets: List[FrozenSet[str]]) -> bool:
         """
         Check if a path is significantly different from existing paths.
         
         Args:
             new_path: Path to check
-            existing_paths: List of existing paths
+            existing_id_sets: Node ids of each existing path
             
         Returns:
             bool: True if path is unique enough
         """
-        if not existing_paths:
+        if not existing_id_sets:
             return True
             
-        for existing_path in existing_paths:
-            common_nodes = set(n.id for n in new_path) & set(n.id for n in existing_path)
+        new_ids = {n.id for n in new_path}
+        for existing_ids in existing_id_sets:
+            common_nodes = new_ids & existing_ids
             # If more than 50% of nodes are common, consider it too similar
             if len(common_nodes) > len(new_path) * 0.5:
                 return False
@@ -1,4 +1,5 @@
 import simpy
+import numpy as np
 from typing import List, Optional
 from src.entities.node import Node
 from src.entities.leader_election import LeaderElection
@@ -26,6 +27,7 @@ class RebalancingScheduler:
         self.rebalancing_engine = rebalancing_engine
         self.current_leader = None
         self.last_election_time = 0
+        self._position = {node: i for i, node in enumerate(nodes)}
         
         # Initialize rebalancing engine with nodes
         self.rebalancing_engine.nodes = {node.id: node for node in nodes}
@@ -40,7 +42,7 @@ class RebalancingScheduler:
                 self.perform_election()
             
             # If we have a leader and pending requests, trigger rebalancing
-            if self.current_leader and any(node.rebalancing_requested for node in self.nodes):
+            if self.current_leader and self.leader_election.has_pending_requests(self.nodes):
                 self.trigger_rebalancing()
             
             # Wait for next cycle
@@ -56,7 +58,7 @@ class RebalancingScheduler:
         current_time = self.env.now
         
         # Always trigger election if we have no leader and there are pending requests
-        if not self.current_leader and any(node.rebalancing_requested for node in self.nodes):
+        if not self.current_leader and self.leader_election.has_pending_requests(self.nodes):
             return True
             
         # Check if current leader is still valid
@@ -66,10 +68,6 @@ class RebalancingScheduler:
             if current_time - self.last_election_time >= self.delta_t:
                 return True
                 
-        # Check if any node has requested rebalancing and we have no leader
-        if not self.current_leader and any(node.rebalancing_requested for node in self.nodes):
-            return True
-            
         return False
         
     def perform_election(self):
@@ -100,35 +98,30 @@ class RebalancingScheduler:
         """
         Trigger rebalancing for nodes that have requested it.
         """
-        for node in self.nodes:
+        # Only visit requesting nodes, in network order
+        position = self._position
+        requesting = sorted((node for node in self.leader_election.requesting_nodes(self.nodes)
+                             if node in position), key=position.__getitem__)
+        for node in requesting:
             if node.rebalancing_requested:
-                # Find imbalanced channels
-                imbalanced_channels = []
-                for peer_id, local_balance in node.local_balances.items():
-                    remote_balance = node.remote_balances[peer_id]
-                    capacity = node.capacities[peer_id]
-                    
-                    # Calculate skewness
-                    skewness = abs(local_balance - remote_balance) / capacity
-                    if skewness > 0.2:  # If channel is significantly imbalanced
-                        imbalanced_channels.append({
-                            'peer_id': peer_id,
-                            'local_balance': local_balance,
-                            'remote_balance': remote_balance,
-                            'capacity': capacity,
-                            'skewness': skewness
-                        })
+                # Find significantly imbalanced channels from the node's channel arrays
+                local = node.local_arr
+                remote = node.remote_arr
+                cap = node.cap_arr
+                skewness = node.skewness_arr
+                imbalanced = np.flatnonzero(skewness > 0.2)
                 
-                if imbalanced_channels:
-                    # Sort channels by skewness
-                    imbalanced_channels.sort(key=lambda x: x['skewness'], reverse=True)
+                if len(imbalanced):
+                    # Most skewed channels first (stable, like the sort it replaces)
+                    order = imbalanced[np.argsort(-skewness[imbalanced], kind='stable')]
+                    channel_ids = node.channel_ids
                     
                     # Try to rebalance each channel
-                    for channel in imbalanced_channels:
-                        peer_id = channel['peer_id']
-                        local_balance = channel['local_balance']
-                        remote_balance = channel['remote_balance']
-                        capacity = channel['capacity']
+                    for slot in order:
+                        peer_id = channel_ids[slot]
+                        local_balance = float(local[slot])
+                        remote_balance = float(remote[slot])
+                        capacity = float(cap[slot])
                         
                         # Calculate target balance that maintains 20% minimum
                         if local_balance > remote_balance:
@@ -1,7 +1,17 @@
 import sys
 
+# Payments are relayed by node N; direction 0 is L->R and 1 is R->L
+_DIRECTIONS = {("L", "R"): 0, ("R", "L"): 1}
+_PATHS = (("L", "N", "R"), ("R", "N", "L"))
+_CHANNELS = (("L", "R"), ("R", "L"))  # (incoming, outgoing) channel of N per direction
+
 
 class Transaction:
+    # Created once per payment, so instances skip the per-object __dict__
+    __slots__ = ('env', 'time_of_arrival', 'source', 'destination', 'amount', 'verbose',
+                 'verbose_also_print_transactions', 'status', 'direction', 'path',
+                 'previous_node', 'current_node', 'next_node', '_repr')
+
     def __init__(self, env, topology, time_of_arrival, source, destination, amount, verbose, verbose_also_print_transactions):
         self.env = env
         self.time_of_arrival = time_of_arrival
@@ -11,50 +21,40 @@ class Transaction:
         self.verbose = verbose
         self.verbose_also_print_transactions = verbose_also_print_transactions
         self.status = "PENDING"
+        self._repr = None  # formatted on first use; the fields it shows never change
         self.pathfinder(topology)
 
         if self.verbose and self.verbose_also_print_transactions:
             print("Time {:.2f}: Transaction {} generated.".format(self.env.now, self))
 
     def pathfinder(self, topology):
-        if self.source == "L" and self.destination == "R":
-            self.path = ["L", "N", "R"]
-            self.previous_node = "L"
-            self.current_node = topology["N"]
-            self.next_node = "R"
-        elif self.source == "R" and self.destination == "L":
-            self.path = ["R", "N", "L"]
-            self.previous_node = "R"
-            self.current_node = topology["N"]
-            self.next_node = "L"
-        else:
+        direction = _DIRECTIONS.get((self.source, self.destination))
+        if direction is None:
             print("Input error")
             sys.exit(1)
+        self.direction = direction
+        self.path = list(_PATHS[direction])
+        self.previous_node, self.next_node = _CHANNELS[direction]
+        self.current_node = topology["N"]
 
-    def run(self):
-        # Check if we can forward the payment
-        if self.source == "L" and self.destination == "R":
-            # Check if we have enough local balance in the R channel
-            if self.current_node.local_balances["R"] >= self.amount:
-                # Update balances
-                self.current_node.update_balances("L", self.amount, -self.amount)  # Receive on L channel
-                self.current_node.update_balances("R", -self.amount, self.amount)  # Forward to R channel
-                self.status = "SUCCEEDED"
-            else:
-                self.status = "FAILED"
-        elif self.source == "R" and self.destination == "L":
-            # Check if we have enough local balance in the L channel
-            if self.current_node.local_balances["L"] >= self.amount:
-                # Update balances
-                self.current_node.update_balances("R", self.amount, -self.amount)  # Receive on R channel
-                self.current_node.update_balances("L", -self.amount, self.amount)  # Forward to L channel
-                self.status = "SUCCEEDED"
-            else:
-                self.status = "FAILED"
+    def execute(self):
+        """Forward the payment at the current simulation time, without scheduling any events."""
+        # Forward the payment if the outgoing channel has enough local balance
+        in_channel, out_channel = _CHANNELS[self.direction]
+        node = self.current_node
+        amount = self.amount
+        if node.local_balances[out_channel] >= amount:
+            node.update_balances(in_channel, amount, -amount)  # Receive on the incoming channel
+            node.update_balances(out_channel, -amount, amount)  # Forward on the outgoing channel
+            self.status = "SUCCEEDED"
+        else:
+            self.status = "FAILED"
 
         if self.verbose and self.verbose_also_print_transactions:
             print("Time {:.2f}: Transaction {} {}".format(self.env.now, self, self.status))
 
+    def run(self):
+        self.execute()
         yield self.env.timeout(0)  # Yield control back to the simulator
 
     def get_transaction_signature(self):
@@ -62,4 +62,6 @@ class Transaction:
         return transaction_signature
 
     def __repr__(self):
-        return "%s->%s t=%.2f a=%d" % (self.source, self.destination, self.time_of_arrival, self.amount)
+        if self._repr is None:
+            self._repr = "%s->%s t=%.2f a=%d" % (self.source, self.destination, self.time_of_arrival, self.amount)
+        return self._repr
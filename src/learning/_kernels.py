@@ -0,0 +1,65 @@
+"""
+Graph kernels for candidate path search.
+
+The kernels are compiled with numba when it is installed. Without numba they
+run as plain Python and callers are expected to prefer networkx instead.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:  # numba is optional
+    HAVE_NUMBA = False
+
+
+def _jit(func):
+    """Compile a kernel with numba when available; run it as Python otherwise."""
+    return njit(cache=True)(func) if HAVE_NUMBA else func
+
+
+@_jit
+def all_simple_paths(indptr, indices, source, target, cutoff, out_buf, out_lens):
+    """
+    Depth-first enumeration of the simple paths from source to target over a CSR graph.
+    
+    Paths are produced in the same order as networkx.all_simple_paths and have
+    at most cutoff edges. Each path is written as a row of out_buf (node
+    indices) with its node count in out_lens; paths beyond the buffer's rows
+    are counted but not written.
+    
+    Returns:
+        Total number of paths found
+    """
+    n_paths = 0
+    path = np.empty(cutoff + 1, dtype=np.int64)
+    ptr = np.empty(cutoff + 1, dtype=np.int64)
+    visited = np.zeros(indptr.shape[0] - 1, dtype=np.bool_)
+    
+    path[0] = source
+    ptr[0] = indptr[source]
+    visited[source] = True
+    depth = 0
+    while depth >= 0:
+        u = path[depth]
+        if ptr[depth] == indptr[u + 1]:
+            # All neighbours explored: backtrack
+            visited[u] = False
+            depth -= 1
+            continue
+        v = indices[ptr[depth]]
+        ptr[depth] += 1
+        if visited[v]:
+            continue
+        if v == target:
+            if n_paths < out_buf.shape[0]:
+                out_buf[n_paths, :depth + 1] = path[:depth + 1]
+                out_buf[n_paths, depth + 1] = v
+                out_lens[n_paths] = depth + 2
+            n_paths += 1
+        elif depth + 1 < cutoff:
+            depth += 1
+            path[depth] = v
+            ptr[depth] = indptr[v]
+            visited[v] = True
+    return n_paths
@@ -2,12 +2,105 @@
 Balance-Aware Graph Neural Network for path ranking in DEBAL.
 """
 
+import warnings
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from torch_geometric.nn import GCNConv
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import networkx as nx
+import numpy as np
+
+from ._kernels import HAVE_NUMBA, all_simple_paths
+
+# Below this many nodes networkx enumerates paths faster than the compiled DFS
+# pays for its CSR conversion
+_DFS_MIN_NODES = 64
+def _script(module: nn.Module) -> nn.Module:
+    """TorchScript a module, or return it unchanged where scripting is unsupported."""
+    try:
+        with warnings.catch_warnings():
+            # Newer torch releases flag TorchScript as deprecated but still support it
+            warnings.simplefilter("ignore", FutureWarning)
+            return torch.jit.script(module)
+    except Exception:  # builds without TorchScript run the module eagerly
+        return module
+
+
+# Longest cutoff for which the two-sided search replaces networkx
+_MITM_MAX_CUTOFF = 4
+
+
+def _half_paths(adj, start: int, stop: int, depth: int) -> Dict:
+    """
+    Simple paths from start of at most depth edges, grouped by (end node, edges).
+    
+    Paths may end at stop but are not extended through it.
+    """
+    halves = {}
+    
+    def walk(path, on_path):
+        u = path[-1]
+        halves.setdefault((u, len(path) - 1), []).append(path)
+        if len(path) - 1 < depth and u != stop:
+            for v in adj[u]:
+                if v not in on_path:
+                    on_path.add(v)
+                    walk(path + [v], on_path)
+                    on_path.discard(v)
+                    
+    walk([start], {start})
+    return halves
+
+
+def _meet_in_middle_paths(graph: nx.Graph, source: int, target: int,
+                          cutoff: int) -> List[List[int]]:
+    """
+    All simple paths of at most cutoff edges, found from both ends.
+    
+    Half-paths of up to ceil(cutoff/2) edges from the source are joined with
+    half-paths of up to floor(cutoff/2) edges walked back from the target.
+    Each path is split once, with its forward half as long as or one edge
+    longer than its backward half. The result is ordered as
+    networkx.all_simple_paths would yield it.
+    
+    Args:
+        graph: NetworkX graph (not a multigraph)
+        source: Source node
+        target: Target node, different from source
+        cutoff: Maximum number of edges per path
+        
+    Returns:
+        List of paths
+    """
+    forward = _half_paths(graph.adj, source, target, (cutoff + 1) // 2)
+    backward = _half_paths(graph.pred if graph.is_directed() else graph.adj,
+                           target, source, cutoff // 2)
+    
+    paths = []
+    for (meet, a), heads in forward.items():
+        for b in (a, a - 1):
+            if b < 0 or a + b > cutoff:
+                continue
+            for back in backward.get((meet, b), ()):
+                tail = back[-2::-1]  # meet excluded, ending at target
+                tail_nodes = set(tail)
+                for head in heads:
+                    if tail_nodes.isdisjoint(head):
+                        paths.append(head + tail)
+                        
+    # networkx's DFS order: compare paths by each hop's position in the adjacency
+    position = {}
+    def hop_positions(path):
+        key = []
+        for u, v in zip(path, path[1:]):
+            if u not in position:
+                position[u] = {w: i for i, w in enumerate(graph.adj[u])}
+            key.append(position[u][v])
+        return key
+    paths.sort(key=hop_positions)
+    return paths
+
 
 class BalanceAwareGNN(nn.Module):
     def __init__(self, input_dim: int = 2, hidden_dim: int = 64, output_dim: int = 32):
@@ -21,35 +114,49 @@ class BalanceAwareGNN(nn.Module):
         """
         super().__init__()
         
+        # The MLPs are small and called on every update and ranking, so they
+        # are TorchScripted to cut Python dispatch overhead
         # Node embedding layers
-        self.node_embedding = nn.Sequential(
+        self.node_embedding = _script(nn.Sequential(
             nn.Linear(input_dim, hidden_dim),
             nn.ReLU(),
             nn.Linear(hidden_dim, output_dim)
-        )
+        ))
         
         # Edge embedding layers
-        self.edge_embedding = nn.Sequential(
+        self.edge_embedding = _script(nn.Sequential(
             nn.Linear(3, hidden_dim),  # 3 features: capacity, local_balance, remote_balance
             nn.ReLU(),
             nn.Linear(hidden_dim, output_dim)
-        )
+        ))
         
         # Path scoring layer
-        self.path_scoring = nn.Sequential(
+        self.path_scoring = _script(nn.Sequential(
             nn.Linear(output_dim * 2, hidden_dim),
             nn.ReLU(),
             nn.Linear(hidden_dim, 1)
-        )
+        ))
         
         # Initialize embeddings
         self.node_embeddings = None
         self.edge_index = None
         self.constraint_scores = None
+        self.edge_lut = {}              # {(u, v): edge id} for the current edge_index
+        self._edge_source = None        # edge_index argument the tensor and lut were built from
+        self._constraint_np = None      # NumPy view of constraint_scores
+        self._name_to_idx = {}          # {graph node name: row in node_embeddings}
+        self._names_source = None       # node_names argument the mapping was built from
+        self._features_sig = None       # hash of the features the embeddings were computed from
+        self._edge_sources = None       # source node of each edge, as a NumPy array
+        self._csr_graph = None          # graph the cached CSR adjacency was built from
+        self._csr_key = None            # (node count, edge count) at build time
+        self._csr = None
+        self._path_buf_rows = 1024      # rows of the path buffer for the compiled search
         
     def update_state(self, node_features: List[List[float]], 
                     edge_index: List[List[int]], 
-                    edge_features: List[List[float]]):
+                    edge_features: List[List[float]], node_names: List[str] = None,
+                    dirty_edges: List[int] = None, dirty_nodes: List[int] = None):
         """
         Update the GNN state with new network features.
         
@@ -57,74 +164,129 @@ class BalanceAwareGNN(nn.Module):
             node_features: List of node feature vectors
             edge_index: List of edge indices
             edge_features: List of edge feature vectors
+            node_names: Graph node names in row order of node_features; without
+                them, names like "node_3" are parsed for their row
+            dirty_edges: Rows of edge_features that changed since the last update.
+                Only their constraint scores and the embeddings of the changed
+                nodes are recomputed; None recomputes everything
+            dirty_nodes: Rows of node_features that changed, used with dirty_edges;
+                None takes the source nodes of the dirty edges
+        """
+        if (dirty_edges is not None and edge_index is self._edge_source and
+                self.constraint_scores is not None and
+                len(self.constraint_scores) == len(edge_features)):
+            self._update_dirty(node_features, edge_features, dirty_edges, dirty_nodes)
+            return
+            
+        node_features = np.asarray(node_features, dtype=np.float32)
+        edge_features = np.asarray(edge_features, dtype=np.float32)
+        
+        # Embeddings and constraint scores only depend on the feature values,
+        # so they are kept while the same values are passed again
+        signature = hash((node_features.shape, node_features.tobytes(),
+                          edge_features.shape, edge_features.tobytes()))
+        if signature != self._features_sig:
+            with torch.inference_mode():
+                node_tensor = torch.from_numpy(node_features)
+                edge_tensor = torch.from_numpy(edge_features)
+                
+                # Compute node embeddings
+                self.node_embeddings = self.node_embedding(node_tensor)
+                
+                # Compute constraint scores (balance ratios): min(local, remote) / capacity
+                self.constraint_scores = (torch.minimum(edge_tensor[:, 1], edge_tensor[:, 2]) /
+                                          edge_tensor[:, 0])
+            self._constraint_np = self.constraint_scores.numpy()
+            self._features_sig = signature
+            
+        # Store edge index and its (u, v) -> edge id lookup; both only change
+        # with the topology, so they are reused while the same edge_index is passed
+        if edge_index is not self._edge_source:
+            self.edge_index = torch.tensor(edge_index, dtype=torch.long).t()
+            self.edge_lut = {(u, v): i for i, (u, v) in enumerate(self.edge_index.t().tolist())}
+            self._edge_sources = self.edge_index[0].numpy()
+            self._edge_source = edge_index
+        if node_names is not None and node_names is not self._names_source:
+            self._name_to_idx = {name: i for i, name in enumerate(node_names)}
+            self._names_source = node_names
+            
+    def _update_dirty(self, node_features, edge_features, dirty_edges: List[int],
+                      dirty_nodes: List[int] = None):
         """
-        # Convert to tensors
-        node_tensor = torch.tensor(node_features, dtype=torch.float)
-        edge_tensor = torch.tensor(edge_features, dtype=torch.float)
+        Refresh the state for a few changed edges and nodes in place.
         
-        # Compute node embeddings
-        self.node_embeddings = self.node_embedding(node_tensor)
+        Args:
+            node_features: Node feature vectors, current for the dirty nodes
+            edge_features: Edge feature vectors
+            dirty_edges: Rows of edge_features that changed
+            dirty_nodes: Rows of node_features that changed; None takes the
+                source nodes of the dirty edges
+        """
+        dirty = np.asarray(dirty_edges, dtype=np.int64)
+        with torch.inference_mode():
+            edge_rows = torch.from_numpy(np.asarray(np.asarray(edge_features)[dirty], dtype=np.float32))
+            self.constraint_scores[torch.from_numpy(dirty)] = (
+                torch.minimum(edge_rows[:, 1], edge_rows[:, 2]) / edge_rows[:, 0])
+            if dirty_nodes is None:
+                rows = np.unique(self._edge_sources[dirty])
+            else:
+                rows = np.asarray(dirty_nodes, dtype=np.int64)
+            node_rows = torch.from_numpy(np.asarray(np.asarray(node_features)[rows], dtype=np.float32))
+            self.node_embeddings[torch.from_numpy(rows)] = self.node_embedding(node_rows)
+        # _constraint_np shares memory with constraint_scores and is current already;
+        # the next full update cannot be skipped by its signature
+        self._features_sig = None
         
-        # Compute edge embeddings
-        edge_embeddings = self.edge_embedding(edge_tensor)
+    def _hop_edges(self, path: List[int], edge_index: torch.Tensor) -> List:
+        """
+        Edge id of each hop of a path, or None for hops without an edge.
         
-        # Store edge index
-        self.edge_index = torch.tensor(edge_index, dtype=torch.long).t()
+        Uses the edge lookup for the stored state and falls back to scanning
+        edge_index for any other tensors.
+        """
+        if edge_index is self.edge_index:
+            return [self.edge_lut.get(hop) for hop in zip(path, path[1:])]
+        edges = []
+        for u, v in zip(path, path[1:]):
+            match = ((edge_index[0] == u) & (edge_index[1] == v)).nonzero()
+            edges.append(int(match[0, 0]) if len(match) else None)
+        return edges
         
-        # Compute constraint scores (balance ratios)
-        self.constraint_scores = torch.min(
-            edge_tensor[:, 1] / edge_tensor[:, 0],  # local_balance / capacity
-            edge_tensor[:, 2] / edge_tensor[:, 0]   # remote_balance / capacity
-        )
+    def _edge_scores(self, edges: List[int], constraint_scores: torch.Tensor):
+        """Constraint scores of the given edge ids as floats."""
+        if constraint_scores is self.constraint_scores:
+            return self._constraint_np[edges].tolist()
+        return constraint_scores[edges].tolist()
         
-    def rank_paths(self, graph: nx.Graph, source: str, target: str,
-                  node_embeddings: torch.Tensor, constraint_scores: torch.Tensor,
-                  edge_index: torch.Tensor) -> List[Tuple[float, List[str]]]:
+    def _node_rows(self, path: List) -> Optional[List[int]]:
         """
-        Rank possible paths between source and target nodes.
+        Row in node_embeddings of each node of a path.
+        
+        Nodes are looked up by the node_names given to update_state. Without
+        them, integer nodes are their own rows and names like "node_3" are
+        parsed once for theirs.
         
         Args:
-            graph: NetworkX graph
-            source: Source node ID
-            target: Target node ID
-            node_embeddings: Node embeddings tensor
-            constraint_scores: Constraint scores tensor
-            edge_index: Edge index tensor
+            path: Path as graph node names
             
         Returns:
-            List of (score, path) tuples, sorted by score
+            The rows, or None if a node has no row
         """
-        # Get all simple paths
-        paths = list(nx.all_simple_paths(graph, source, target, cutoff=4))
-        
-        # Score each path
-        scored_paths = []
-        for path in paths:
-            # Get node indices
-            node_indices = [int(node.split('_')[1]) for node in path]
-            
-            # Get embeddings for nodes in path
-            path_embeddings = node_embeddings[node_indices]
-            
-            # Compute path score
-            source_embedding = path_embeddings[0]
-            target_embedding = path_embeddings[-1]
-            path_score = self.path_scoring(
-                torch.cat([source_embedding, target_embedding])
-            ).item()
-            
-            # Adjust score based on constraint scores
-            for i in range(len(path) - 1):
-                u = int(path[i].split('_')[1])
-                v = int(path[i + 1].split('_')[1])
-                edge_idx = (edge_index[0] == u) & (edge_index[1] == v)
-                if edge_idx.any():
-                    path_score *= constraint_scores[edge_idx].item()
-                    
-            scored_paths.append((path_score, path))
-            
-        # Sort paths by score
-        return sorted(scored_paths, key=lambda x: x[0], reverse=True)
+        name_to_idx = self._name_to_idx
+        rows = []
+        for node in path:
+            row = name_to_idx.get(node)
+            if row is None:
+                if self._names_source is not None:
+                    return None
+                if isinstance(node, (int, np.integer)):
+                    row = int(node)
+                elif isinstance(node, str) and node.startswith('node_') and node[5:].isdigit():
+                    row = name_to_idx[node] = int(node[5:])
+                else:
+                    return None
+            rows.append(row)
+        return rows
         
     def forward(self, x: torch.Tensor, edge_index: torch.Tensor) -> torch.Tensor:
         """
@@ -156,28 +318,21 @@ class BalanceAwareGNN(nn.Module):
         if len(path) < 2:
             return -float('inf')
             
-        # Get embeddings for path nodes
-        path_embeddings = node_embeddings[path]
+        # Get edge constraint scores; paths with a missing edge are invalid
+        edges = self._hop_edges(path, edge_index)
+        if None in edges:
+            return -float('inf')
+        edge_scores = torch.tensor(self._edge_scores(edges, constraint_scores),
+                                   dtype=node_embeddings.dtype)
         
-        # Calculate path features
-        path_features = []
-        for i in range(len(path) - 1):
-            # Get edge constraint score
-            edge_mask = (edge_index[0] == path[i]) & (edge_index[1] == path[i + 1])
-            if not edge_mask.any():
-                return -float('inf')
-                
-            edge_score = constraint_scores[edge_mask].item()
-            
-            # Concatenate node embeddings
-            node_pair = torch.cat([path_embeddings[i], path_embeddings[i + 1]])
-            path_features.append(node_pair * edge_score)
-            
-        # Average path features
-        path_features = torch.stack(path_features).mean(dim=0)
+        # Concatenated node embeddings of each hop, weighted by its edge score and averaged
+        path_embeddings = node_embeddings[path]
+        node_pairs = torch.cat([path_embeddings[:-1], path_embeddings[1:]], dim=1)
+        path_features = (node_pairs * edge_scores[:, None]).mean(dim=0)
         
         # Score path
-        score = self.path_scoring(path_features)
+        with torch.inference_mode():
+            score = self.path_scoring(path_features)
         return score.item()
         
     def find_candidate_paths(self, graph: nx.Graph, source: int, target: int, 
@@ -194,23 +349,82 @@ class BalanceAwareGNN(nn.Module):
         Returns:
             List of candidate paths
         """
-        paths = []
-        for path in nx.all_simple_paths(graph, source=source, target=target, 
-                                      cutoff=max_length):
-            if len(path) >= 2:  # Ensure path has at least one edge
-                paths.append(path)
-        return paths
+        simple = (source != target and source in graph and target in graph and
+                  not graph.is_multigraph())
+        csr = self._graph_csr(graph) if simple else None
+        if csr is None and simple and 1 <= max_length <= _MITM_MAX_CUTOFF:
+            return _meet_in_middle_paths(graph, source, target, max_length)
+        if csr is None:
+            paths = []
+            for path in nx.all_simple_paths(graph, source=source, target=target, 
+                                          cutoff=max_length):
+                if len(path) >= 2:  # Ensure path has at least one edge
+                    paths.append(path)
+            return paths
+            
+        nodes, index, indptr, indices = csr
+        out_buf = np.empty((self._path_buf_rows, max_length + 1), dtype=np.int64)
+        out_lens = np.empty(self._path_buf_rows, dtype=np.int64)
+        n_paths = all_simple_paths(indptr, indices, index[source], index[target],
+                                   max_length, out_buf, out_lens)
+        if n_paths > out_buf.shape[0]:
+            # Buffer was too small: grow it to the exact count and search again
+            self._path_buf_rows = n_paths
+            out_buf = np.empty((n_paths, max_length + 1), dtype=np.int64)
+            out_lens = np.empty(n_paths, dtype=np.int64)
+            all_simple_paths(indptr, indices, index[source], index[target],
+                             max_length, out_buf, out_lens)
+        return [[nodes[i] for i in row[:n]]
+                for row, n in zip(out_buf[:n_paths].tolist(), out_lens[:n_paths].tolist())]
+            
+    def _graph_csr(self, graph: nx.Graph):
+        """
+        CSR adjacency of the graph for the compiled path search.
+        
+        The arrays are cached per graph and rebuilt when its node or edge
+        count changes. Returns None when networkx should be used instead.
+        
+        Args:
+            graph: NetworkX graph
+            
+        Returns:
+            (nodes, index, indptr, indices) or None
+        """
+        if (not HAVE_NUMBA or graph.is_multigraph() or
+                graph.number_of_nodes() < _DFS_MIN_NODES):
+            return None
+        key = (graph.number_of_nodes(), graph.number_of_edges())
+        if self._csr_graph is graph and self._csr_key == key:
+            return self._csr
+            
+        nodes = list(graph.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        adj = graph.adj
+        # Neighbours keep the adjacency order so paths come out in networkx's order
+        degrees = np.fromiter((len(adj[node]) for node in nodes), dtype=np.int64,
+                              count=len(nodes))
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        indices = np.fromiter((index[v] for node in nodes for v in adj[node]),
+                              dtype=np.int64, count=int(indptr[-1]))
         
-    def rank_paths(self, graph: nx.Graph, source: int, target: int, 
+        self._csr_graph, self._csr_key = graph, key
+        self._csr = (nodes, index, indptr, indices)
+        return self._csr
+        
+    def rank_paths(self, graph: nx.Graph, source, target, 
                   node_embeddings: torch.Tensor, constraint_scores: torch.Tensor,
-                  edge_index: torch.Tensor, max_length: int = 3) -> List[Tuple[float, List[int]]]:
+                  edge_index: torch.Tensor, max_length: int = 3) -> List[Tuple[float, List]]:
         """
         Rank candidate paths between source and target nodes.
         
+        Graph nodes are mapped to their embedding rows with `_node_rows`;
+        the returned paths keep the graph's node names.
+        
         Args:
             graph: NetworkX graph
-            source: Source node index
-            target: Target node index
+            source: Source node
+            target: Target node
             node_embeddings: Node embeddings from GNN
             constraint_scores: Edge constraint scores
             edge_index: Graph connectivity
@@ -220,11 +434,35 @@ class BalanceAwareGNN(nn.Module):
             List of (score, path) tuples, sorted by score in descending order
         """
         paths = self.find_candidate_paths(graph, source, target, max_length)
-        scored_paths = []
         
+        # Flatten the hops of all valid paths (every hop has an edge)
+        valid_paths = []
+        hop_src, hop_dst, hop_edges, hop_path = [], [], [], []
         for path in paths:
-            score = self.score_path(path, node_embeddings, constraint_scores, edge_index)
-            if score > -float('inf'):  # Only include valid paths
-                scored_paths.append((score, path))
-                
-        return sorted(scored_paths, key=lambda x: x[0], reverse=True) 
\ No newline at end of file
+            rows = self._node_rows(path)
+            if rows is None:
+                continue
+            edges = self._hop_edges(rows, edge_index)
+            if None in edges:
+                continue
+            hop_path.extend([len(valid_paths)] * len(edges))
+            valid_paths.append(path)
+            hop_src.extend(rows[:-1])
+            hop_dst.extend(rows[1:])
+            hop_edges.extend(edges)
+        if not valid_paths:
+            return []
+            
+        # Score all paths in one batch: the per-path mean of the edge-weighted
+        # node pair embeddings goes through the scoring MLP in a single forward
+        with torch.inference_mode():
+            edge_scores = torch.tensor(self._edge_scores(hop_edges, constraint_scores),
+                                       dtype=node_embeddings.dtype)
+            node_pairs = torch.cat([node_embeddings[hop_src], node_embeddings[hop_dst]], dim=1)
+            segment = torch.tensor(hop_path, dtype=torch.long)
+            sums = torch.zeros(len(valid_paths), node_pairs.shape[1], dtype=node_pairs.dtype)
+            sums.index_add_(0, segment, node_pairs * edge_scores[:, None])
+            hops = torch.bincount(segment, minlength=len(valid_paths)).to(sums.dtype)
+            scores = self.path_scoring(sums / hops[:, None]).squeeze(-1).tolist()
+            
+        return sorted(zip(scores, valid_paths), key=lambda x: x[0], reverse=True) 
\ No newline at end of file
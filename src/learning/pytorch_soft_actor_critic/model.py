@@ -76,13 +76,16 @@ class GaussianPolicy(nn.Module):
         self.mean_linear = nn.Linear(hidden_dim, num_actions)
         self.log_std_linear = nn.Linear(hidden_dim, num_actions)
 
-        self.action_scale = torch.tensor(1.)
-        self.action_bias = torch.tensor(0.)
+        # action rescaling; buffers move with the module (not saved in the state dict)
+        action_scale = torch.tensor(1.)
+        action_bias = torch.tensor(0.)
         if action_space is not None:
-            self.action_scale = torch.FloatTensor(
+            action_scale = torch.FloatTensor(
                 (action_space.high - action_space.low) / 2.)
-            self.action_bias = torch.FloatTensor(
+            action_bias = torch.FloatTensor(
                 (action_space.high + action_space.low) / 2.)
+        self.register_buffer('action_scale', action_scale, persistent=False)
+        self.register_buffer('action_bias', action_bias, persistent=False)
 
     def forward(self, state):
         x = F.relu(self.linear1(state))
@@ -128,11 +131,6 @@ class GaussianPolicy(nn.Module):
         mean = torch.tanh(mean) * action_scale_at_this_step + action_bias_at_this_step
         return action, log_prob, mean
 
-    def to(self, device):
-        self.action_scale = self.action_scale.to(device)
-        self.action_bias = self.action_bias.to(device)
-        return super(GaussianPolicy, self).to(device)
-
 
 class DeterministicPolicy(nn.Module):
     def __init__(self, num_inputs, num_actions, hidden_dim, action_space=None):
@@ -141,19 +139,21 @@ class DeterministicPolicy(nn.Module):
         self.linear2 = nn.Linear(hidden_dim, hidden_dim)
 
         self.mean = nn.Linear(hidden_dim, num_actions)
-        self.noise = torch.Tensor(num_actions)
+        self.register_buffer('noise', torch.Tensor(num_actions), persistent=False)
 
         self.apply(weights_init_)
 
-        # action rescaling
+        # action rescaling; buffers move with the module (not saved in the state dict)
         if action_space is None:
-            self.action_scale = 1.
-            self.action_bias = 0.
+            action_scale = torch.tensor(1.)
+            action_bias = torch.tensor(0.)
         else:
-            self.action_scale = torch.FloatTensor(
+            action_scale = torch.FloatTensor(
                 (action_space.high - action_space.low) / 2.)
-            self.action_bias = torch.FloatTensor(
+            action_bias = torch.FloatTensor(
                 (action_space.high + action_space.low) / 2.)
+        self.register_buffer('action_scale', action_scale, persistent=False)
+        self.register_buffer('action_bias', action_bias, persistent=False)
 
     def forward(self, state):
         x = F.relu(self.linear1(state))
@@ -167,9 +167,3 @@ class DeterministicPolicy(nn.Module):
         noise = noise.clamp(-0.25, 0.25)
         action = mean + noise
         return action, torch.tensor(0.), mean
-
-    def to(self, device):
-        self.action_scale = self.action_scale.to(device)
-        self.action_bias = self.action_bias.to(device)
-        self.noise = self.noise.to(device)
-        return super(DeterministicPolicy, self).to(device)
@@ -4,10 +4,11 @@ Replay memory for Soft Actor-Critic.
 
 import os
 import pickle
-import random
 import numpy as np
 import torch
-from collections import deque
+
+# Per-transition fields: state, action, reward, next state, done
+FIELDS = ('s', 'a', 'r', 's2', 'd')
 
 
 class ReplayMemory:
@@ -15,10 +16,17 @@ class ReplayMemory:
         """
         Initialize replay memory.
         
+        Transitions are stored field by field in fixed-size arrays used as a
+        ring buffer. The arrays are allocated on the first push, once the
+        state and action shapes are known.
+        
         Args:
             capacity: Maximum number of transitions to store
         """
-        self.memory = deque(maxlen=capacity)
+        self.capacity = capacity
+        self.pos = 0     # row the next transition is written to
+        self.size = 0    # number of stored transitions
+        self.s = self.a = self.r = self.s2 = self.d = None
 
     def push(self, state, action, reward, next_state, done):
         """
@@ -31,24 +39,43 @@ class ReplayMemory:
             next_state: Next state
             done: Whether episode is done
         """
-        self.memory.append((state, action, reward, next_state, done))
+        if self.s is None:
+            self.s = np.empty((self.capacity,) + np.shape(state), dtype=np.float32)
+            self.a = np.empty((self.capacity,) + np.shape(action), dtype=np.float32)
+            self.r = np.empty(self.capacity, dtype=np.float32)
+            self.s2 = np.empty((self.capacity,) + np.shape(next_state), dtype=np.float32)
+            self.d = np.empty(self.capacity, dtype=np.float32)
+        i = self.pos
+        self.s[i] = state
+        self.a[i] = action
+        self.r[i] = reward
+        self.s2[i] = next_state
+        self.d[i] = done
+        self.pos = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
 
     def sample(self, batch_size):
         """
         Sample a batch of transitions from memory.
         
+        Rows are drawn uniformly with replacement and gathered with one index
+        vector per field.
+        
         Args:
             batch_size: Number of transitions to sample
             
         Returns:
-            Tuple of (states, actions, rewards, next_states, dones)
+            Tuple of (states, actions, rewards, next_states, dones); rewards
+            and dones have shape (batch_size, 1)
         """
-        state, action, reward, next_state, done = zip(*random.sample(self.memory, batch_size))
-        return (torch.FloatTensor(state),
-                torch.FloatTensor(action),
-                torch.FloatTensor(reward),
-                torch.FloatTensor(next_state),
-                torch.FloatTensor(done))
+        if batch_size > self.size:
+            raise ValueError("Sample larger than memory")
+        idx = np.random.randint(0, self.size, size=batch_size)
+        return (torch.from_numpy(self.s[idx]),
+                torch.from_numpy(self.a[idx]),
+                torch.from_numpy(self.r[idx]).unsqueeze(1),
+                torch.from_numpy(self.s2[idx]),
+                torch.from_numpy(self.d[idx]).unsqueeze(1))
 
     def __len__(self):
         """
@@ -57,7 +84,7 @@ class ReplayMemory:
         Returns:
             int: Number of transitions in memory
         """
-        return len(self.memory)
+        return self.size
 
     def save_buffer(self, env_name, suffix="", save_path=None):
         if not os.path.exists('checkpoints/'):
@@ -67,11 +94,36 @@ class ReplayMemory:
             save_path = "checkpoints/sac_buffer_{}_{}".format(env_name, suffix)
         print('Saving buffer to {}'.format(save_path))
 
-        with open(save_path, 'wb') as f:
-            pickle.dump(self.memory, f)
+        # Stored fields, oldest transition first, as one compressed .npz archive
+        order = (np.arange(self.size) + (self.pos if self.size == self.capacity else 0)) % self.capacity
+        fields = {} if self.s is None else {
+            name: getattr(self, name)[order] for name in FIELDS
+        }
+        with open(save_path, 'wb') as f:  # a file object keeps numpy from appending .npz
+            np.savez_compressed(f, **fields)
 
     def load_buffer(self, save_path):
         print('Loading buffer from {}'.format(save_path))
 
-        with open(save_path, "rb") as f:
-            self.memory = pickle.load(f)
+        self.pos = self.size = 0
+        self.s = self.a = self.r = self.s2 = self.d = None
+        try:
+            with np.load(save_path) as saved:
+                fields = {name: saved[name] for name in saved.files}
+        except ValueError:
+            # Older buffers were pickled as a deque of transition tuples
+            with open(save_path, "rb") as f:
+                for transition in pickle.load(f):
+                    self.push(*transition)
+            return
+        if not fields:
+            return
+
+        # Allocate through push, then copy the newest transitions that fit in bulk
+        n = len(fields['s'])
+        self.push(*(fields[name][0] for name in FIELDS))
+        keep = min(n, self.capacity)
+        for name in FIELDS:
+            getattr(self, name)[:keep] = fields[name][n - keep:]
+        self.size = keep
+        self.pos = keep % self.capacity
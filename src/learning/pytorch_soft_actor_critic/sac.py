@@ -2,6 +2,7 @@
 Soft Actor-Critic (SAC) implementation.
 """
 
+import math
 import os
 import torch
 import torch.nn as nn
@@ -12,11 +13,39 @@ from torch.optim import Adam
 from src.learning.pytorch_soft_actor_critic.utils import soft_update, hard_update
 from src.learning.pytorch_soft_actor_critic.model import GaussianPolicy, QNetwork, DeterministicPolicy
 
+_LOG_2 = math.log(2.0)
+_HALF_LOG_2PI = 0.5 * math.log(2 * math.pi)
+
+
+def _compile_forward(module):
+    """
+    Replace a module's forward with a torch.compile'd version on CUDA.
+    
+    The forward is compiled rather than the module, so parameters and
+    checkpoint keys stay unchanged. "reduce-overhead" records a CUDA graph per
+    input shape (the update batch and the single-state action selection) and
+    replays it; on CPU or without torch.compile the module is left as is.
+    """
+    if not torch.cuda.is_available() or not hasattr(torch, "compile"):
+        return module
+    try:
+        module.forward = torch.compile(module.forward, mode="reduce-overhead", dynamic=False)
+    except Exception:  # older or unsupported torch builds run eagerly
+        pass
+    return module
+
 
 class Actor(nn.Module):
     def __init__(self, state_dim, action_dim, action_range):
         super(Actor, self).__init__()
         self.action_range = action_range
+        # Action rescaling as buffers, so it moves with the module and has a
+        # static shape; non-persistent to keep checkpoint keys unchanged
+        self.register_buffer('action_scale', torch.tensor(float(action_range[1])),
+                             persistent=False)
+        self.register_buffer('action_bias', torch.tensor(0.), persistent=False)
+        self.register_buffer('_log_action_scale', torch.tensor(math.log(action_range[1])),
+                             persistent=False)
         
         self.l1 = nn.Linear(state_dim, 256)
         self.l2 = nn.Linear(256, 256)
@@ -34,12 +63,14 @@ class Actor(nn.Module):
     def sample(self, state):
         mean, log_std = self.forward(state)
         std = log_std.exp()
-        normal = torch.distributions.Normal(mean, std)
-        x_t = normal.rsample()
+        # Reparameterized Gaussian sample and its log density, without building a distribution
+        noise = torch.randn_like(mean)
+        x_t = mean + std * noise
         y_t = torch.tanh(x_t)
-        action = y_t * torch.tensor(self.action_range[1]).to(state.device)
-        log_prob = normal.log_prob(x_t)
-        log_prob -= torch.log(torch.tensor(self.action_range[1]).to(state.device) * (1 - y_t.pow(2)) + 1e-6)
+        action = y_t * self.action_scale + self.action_bias
+        log_prob = -0.5 * noise.pow(2) - log_std - _HALF_LOG_2PI
+        # Change of variables for the scaled tanh; log(1 - tanh(x)^2) in its stable form
+        log_prob -= self._log_action_scale + 2 * (_LOG_2 - x_t - F.softplus(-2 * x_t))
         log_prob = log_prob.sum(1, keepdim=True)
         return action, log_prob
 
@@ -83,25 +114,44 @@ class SAC:
         self.critic_target = Critic(state_dim, action_dim).to(self.device)
         self.critic_target.load_state_dict(self.critic.state_dict())
         
-        self.alpha = 0.2
+        # Parameter lists for the target update; load_state_dict copies into these
+        # same tensors, so the lists stay valid across checkpoint loads
+        self._critic_params = list(self.critic.parameters())
+        self._target_params = list(self.critic_target.parameters())
+        
+        for module in (self.actor, self.critic, self.critic_target):
+            _compile_forward(module)
+        
+        # Entropy temperature as a device tensor, refreshed in place after every update
+        self.alpha = torch.full((1,), 0.2, device=self.device)
         self.target_entropy = -action_dim
         self.log_alpha = torch.zeros(1, requires_grad=True, device=self.device)
         self.alpha_optimizer = optim.Adam([self.log_alpha], lr=3e-4)
         
+        # Host staging buffer for select_action, pinned so the copy to the GPU is async
+        self._state_buf = torch.empty(state_dim, pin_memory=self.device.type == "cuda")
+        self._batch_buf = None  # pinned staging buffer for update batches (CUDA only)
+        
     def select_action(self, state):
-        state = torch.FloatTensor(state).to(self.device)
-        action, _ = self.actor.sample(state)
-        return action.detach().cpu().numpy()
+        with torch.inference_mode():
+            self._state_buf.copy_(torch.as_tensor(state, dtype=torch.float32).reshape(-1))
+            state = self._state_buf.to(self.device, non_blocking=True).unsqueeze(0)
+            action, _ = self.actor.sample(state)
+            return action.squeeze(0).cpu().numpy()
         
     def update_parameters(self, memory, batch_size):
         # Sample a batch from memory
-        state_batch, action_batch, reward_batch, next_state_batch, mask_batch = memory.sample(batch_size)
-        
-        state_batch = state_batch.to(self.device)
-        next_state_batch = next_state_batch.to(self.device)
-        action_batch = action_batch.to(self.device)
-        reward_batch = reward_batch.to(self.device)
-        mask_batch = mask_batch.to(self.device)
+        batch = memory.sample(batch_size)
+        if self.device.type == "cuda":
+            # Pack the five fields side by side and move them in a single copy
+            fields = [t.reshape(batch_size, -1) for t in batch]
+            widths = [t.shape[1] for t in fields]
+            if self._batch_buf is None or self._batch_buf.shape != (batch_size, sum(widths)):
+                self._batch_buf = torch.empty(batch_size, sum(widths), pin_memory=True)
+            torch.cat(fields, dim=1, out=self._batch_buf)
+            on_device = self._batch_buf.to(self.device, non_blocking=True).split(widths, dim=1)
+            batch = [t.reshape(b.shape) for t, b in zip(on_device, batch)]
+        state_batch, action_batch, reward_batch, next_state_batch, mask_batch = batch
         
         with torch.no_grad():
             next_state_action, next_state_log_pi = self.actor.sample(next_state_batch)
@@ -114,7 +164,7 @@ class SAC:
         qf2_loss = F.mse_loss(qf2, next_q_value)
         qf_loss = qf1_loss + qf2_loss
         
-        self.critic_optimizer.zero_grad()
+        self.critic_optimizer.zero_grad(set_to_none=True)
         qf_loss.backward()
         self.critic_optimizer.step()
         
@@ -124,21 +174,24 @@ class SAC:
         
         policy_loss = ((self.alpha * log_pi) - min_qf_pi).mean()
         
-        self.actor_optimizer.zero_grad()
+        self.actor_optimizer.zero_grad(set_to_none=True)
         policy_loss.backward()
         self.actor_optimizer.step()
         
         alpha_loss = -(self.log_alpha * (log_pi + self.target_entropy).detach()).mean()
         
-        self.alpha_optimizer.zero_grad()
+        self.alpha_optimizer.zero_grad(set_to_none=True)
         alpha_loss.backward()
         self.alpha_optimizer.step()
         
-        self.alpha = self.log_alpha.exp()
+        # Detached from log_alpha, so the next policy loss does not backpropagate into it
+        with torch.no_grad():
+            torch.exp(self.log_alpha, out=self.alpha)
         
-        # Update target networks
-        for param, target_param in zip(self.critic.parameters(), self.critic_target.parameters()):
-            target_param.data.copy_(0.995 * target_param.data + 0.005 * param.data)
+        # Update target networks with one fused multiply and add over all parameters
+        with torch.no_grad():
+            torch._foreach_mul_(self._target_params, 0.995)
+            torch._foreach_add_(self._target_params, self._critic_params, alpha=0.005)
 
     # Save model parameters
     def save_checkpoint(self, env_name, suffix="", ckpt_path=None):
@@ -2,14 +2,34 @@
 Main script to demonstrate the DEBAL system.
 """
 
+import logging
 import time
 import sys
-from src.entities.Node import Node
+from src.entities.node import Node
 from src.entities.leader_election import LeaderElection
 from src.entities.rebalancing_engine import RebalancingEngine
 from src.entities.rebalancing_scheduler import RebalancingScheduler
 
+def print_state(nodes, leader_election):
+    """Print the current leader and every node's channels."""
+    print("\nCurrent state:")
+    leader = leader_election.current_leader
+    print(f"Current leader: {leader.id if leader else 'None'}")
+    
+    for node in nodes:
+        print(f"\nNode {node.id}:")
+        print(f"  Rebalancing requested: {node.rebalancing_requested}")
+        print(f"  Needs rebalancing: {node.needs_rebalancing}")
+        for neighbor_id in node.local_balances:
+            print(f"  Channel with {neighbor_id}:")
+            print(f"    Local balance: {node.local_balances[neighbor_id]}")
+            print(f"    Remote balance: {node.remote_balances[neighbor_id]}")
+            print(f"    Capacity: {node.capacities[neighbor_id]}")
+            print(f"    Fee rate: {node.fee_rates[neighbor_id]}")
+
 def main():
+    # Scheduler progress is reported through logging
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("Starting DEBAL system...")
     
     # Create nodes
@@ -62,30 +82,21 @@ def main():
         for node in nodes:
             if node.decide_rebalancing():
                 node.rebalancing_requested = True
-                node.needs_rebalancing = True
+                scheduler.request_rebalancing(node)
                 print(f"Node {node.id} requested rebalancing")
         
-        # Run for 30 seconds
-        print("Running DEBAL system for 30 seconds...")
-        for i in range(6):  # Check every 5 seconds
-            print(f"\nTime elapsed: {i*5} seconds")
-            time.sleep(5)
-            
-            # Print current state
-            print("\nCurrent state:")
-            leader = leader_election.current_leader
-            print(f"Current leader: {leader.id if leader else 'None'}")
-            
-            for node in nodes:
-                print(f"\nNode {node.id}:")
-                print(f"  Rebalancing requested: {node.rebalancing_requested}")
-                print(f"  Needs rebalancing: {node.needs_rebalancing}")
-                for neighbor_id in node.local_balances:
-                    print(f"  Channel with {neighbor_id}:")
-                    print(f"    Local balance: {node.local_balances[neighbor_id]}")
-                    print(f"    Remote balance: {node.remote_balances[neighbor_id]}")
-                    print(f"    Capacity: {node.capacities[neighbor_id]}")
-                    print(f"    Fee rate: {node.fee_rates[neighbor_id]}")
+        # Run for up to 30 seconds, reporting whenever the scheduler changes state
+        print("Running DEBAL system for up to 30 seconds...")
+        start = time.monotonic()
+        deadline = start + 30.0
+        while time.monotonic() < deadline:
+            if scheduler.state_changed.wait(timeout=1.0):
+                scheduler.state_changed.clear()
+                print(f"\nTime elapsed: {time.monotonic() - start:.1f} seconds")
+                print_state(nodes, leader_election)
+            # Stop early once every request has been served
+            if not any(node.needs_rebalancing for node in nodes):
+                break
         
     except KeyboardInterrupt:
         print("\nStopping DEBAL system...")
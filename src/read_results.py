@@ -1,43 +1,54 @@
+import os
 import h5py
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 
+RUN_PATH = 'relay_node_channel_rebalancing/results/runs/run_00000000/'
+
+# Balance history arrays per channel: result key -> {field: dataset name}
+HISTORY_DATASETS = {
+    'balance_history_' + side: {
+        'times': 'balance_history_times_' + side,
+        'values': 'balance_history_values_' + side,
+        'remote_values': 'remote_balance_history_values_' + side
+    }
+    for side in ('L', 'R')
+}
+
+# Scalar metrics; each is stored as <name>/<name> under the run group
+METRIC_DATASETS = [
+    'success_rate_L_to_R', 'success_rate_R_to_L', 'success_rate_node_total',
+    'success_count_L_to_R', 'success_count_R_to_L',
+    'failure_count_L_to_R', 'failure_count_R_to_L',
+    'success_amount_L_to_R', 'success_amount_R_to_L',
+    'failure_amount_L_to_R', 'failure_amount_R_to_L'
+]
+
+# Result files below this size are loaded whole with the in-memory driver
+CORE_DRIVER_MAX_BYTES = 100 * 2**20
+
+def _dataset_path(name):
+    """Full path of a run dataset inside the results file"""
+    return RUN_PATH + name + '/' + name
+
 def read_hdf5_results(file_paths):
     """Read results from multiple HDF5 files for different policies"""
+    history_paths = {key: {field: _dataset_path(name) for field, name in fields.items()}
+                     for key, fields in HISTORY_DATASETS.items()}
+    metric_paths = {name: _dataset_path(name) for name in METRIC_DATASETS}
+    
     all_results = {}
     for policy, file_path in file_paths.items():
-        with h5py.File(file_path, 'r') as f:
-            base_path = 'relay_node_channel_rebalancing/results/runs/run_00000000/'
-            results = {}
-            
-            # Read balance history
-            results['balance_history_L'] = {
-                'times': np.array(f[base_path + 'balance_history_times_L/balance_history_times_L']),
-                'values': np.array(f[base_path + 'balance_history_values_L/balance_history_values_L']),
-                'remote_values': np.array(f[base_path + 'remote_balance_history_values_L/remote_balance_history_values_L'])
-            }
-            
-            results['balance_history_R'] = {
-                'times': np.array(f[base_path + 'balance_history_times_R/balance_history_times_R']),
-                'values': np.array(f[base_path + 'balance_history_values_R/balance_history_values_R']),
-                'remote_values': np.array(f[base_path + 'remote_balance_history_values_R/remote_balance_history_values_R'])
-            }
-
-            # Read key metrics
-            metrics = {
-                'success_rate_L_to_R': f[base_path + 'success_rate_L_to_R/success_rate_L_to_R'][()],
-                'success_rate_R_to_L': f[base_path + 'success_rate_R_to_L/success_rate_R_to_L'][()],
-                'success_rate_node_total': f[base_path + 'success_rate_node_total/success_rate_node_total'][()],
-                'success_count_L_to_R': f[base_path + 'success_count_L_to_R/success_count_L_to_R'][()],
-                'success_count_R_to_L': f[base_path + 'success_count_R_to_L/success_count_R_to_L'][()],
-                'failure_count_L_to_R': f[base_path + 'failure_count_L_to_R/failure_count_L_to_R'][()],
-                'failure_count_R_to_L': f[base_path + 'failure_count_R_to_L/failure_count_R_to_L'][()],
-                'success_amount_L_to_R': f[base_path + 'success_amount_L_to_R/success_amount_L_to_R'][()],
-                'success_amount_R_to_L': f[base_path + 'success_amount_R_to_L/success_amount_R_to_L'][()],
-                'failure_amount_L_to_R': f[base_path + 'failure_amount_L_to_R/failure_amount_L_to_R'][()],
-                'failure_amount_R_to_L': f[base_path + 'failure_amount_R_to_L/failure_amount_R_to_L'][()]
-            }
-            results.update(metrics)
+        # Small files are read into memory in one go instead of dataset by dataset
+        driver = {}
+        if os.path.getsize(file_path) < CORE_DRIVER_MAX_BYTES:
+            driver = {'driver': 'core', 'backing_store': False}
+        with h5py.File(file_path, 'r', **driver) as f:
+            # Each dataset is read whole in one call
+            results = {key: {field: f[path][()] for field, path in fields.items()}
+                       for key, fields in history_paths.items()}
+            results.update({name: f[path][()] for name, path in metric_paths.items()})
             all_results[policy] = results
     return all_results
 
@@ -48,77 +59,54 @@ def calculate_debal_imbalance(local_balance, remote_balance):
 
 def detect_rebalancing_events(times, values, threshold=20):
     """Detect significant balance changes that indicate rebalancing"""
-    events = []
-    changes = []
-    for i in range(1, len(values)):
-        change = values[i] - values[i-1]
-        if abs(change) > threshold:
-            events.append(times[i])
-            changes.append(change)
-    return events, changes
+    diffs = np.diff(values)
+    mask = np.abs(diffs) > threshold
+    return np.asarray(times)[1:][mask].tolist(), diffs[mask].tolist()
+
+def rebalancing_event_count(results):
+    """Number of rebalancing events detected on both channels of a run"""
+    return sum(len(detect_rebalancing_events(results[key]['times'], results[key]['values'])[0])
+               for key in HISTORY_DATASETS)
 
 def plot_comparison_metrics(all_results):
     """Create comparative plots for different rebalancing policies"""
     plt.rcParams['figure.figsize'] = [20, 15]
-    plt.rcParams['figure.dpi'] = 300
     plt.rcParams['font.size'] = 12
     
-    policies = list(all_results.keys())
+    # One row per policy with every metric and the rebalancing event count
+    df = pd.DataFrame.from_dict(
+        {policy: {**{name: results[name] for name in METRIC_DATASETS},
+                  'rebalancing_count': rebalancing_event_count(results)}
+         for policy, results in all_results.items()},
+        orient='index')
+    policies = list(df.index)
+    success_counts = df['success_count_L_to_R'] + df['success_count_R_to_L']
+    failure_counts = df['failure_count_L_to_R'] + df['failure_count_R_to_L']
+    success_amounts = df['success_amount_L_to_R'] + df['success_amount_R_to_L']
     
     # Create figure with 2x2 subplots
     fig = plt.figure()
     
     # 1. Profit by Rebalancing Policy
     ax1 = plt.subplot(2, 2, 1)
-    profits = []
-    for policy in policies:
-        results = all_results[policy]
-        profit = (results['success_amount_L_to_R'] + results['success_amount_R_to_L'] -
-                 results['failure_amount_L_to_R'] - results['failure_amount_R_to_L'])
-        profits.append(profit)
-    
-    ax1.bar(policies, profits)
+    ax1.bar(policies, success_amounts - df['failure_amount_L_to_R'] - df['failure_amount_R_to_L'])
     ax1.set_title('Profit by Rebalancing Policy')
     ax1.set_ylabel('Profit')
     
     # 2. Success Rate by Rebalancing Policy
     ax2 = plt.subplot(2, 2, 2)
-    success_rates = []
-    for policy in policies:
-        results = all_results[policy]
-        success_rate = results['success_rate_node_total'] * 100  # Convert to percentage
-        success_rates.append(success_rate)
-    
-    ax2.bar(policies, success_rates)
+    ax2.bar(policies, df['success_rate_node_total'] * 100)  # Convert to percentage
     ax2.set_title('Success Rate by Rebalancing Policy')
     ax2.set_ylabel('Success Rate (%)')
     
     # 3. Number of Rebalancing Operations by Policy
     ax3 = plt.subplot(2, 2, 3)
-    rebalancing_counts = []
-    for policy in policies:
-        results = all_results[policy]
-        events_L, _ = detect_rebalancing_events(results['balance_history_L']['times'],
-                                              results['balance_history_L']['values'])
-        events_R, _ = detect_rebalancing_events(results['balance_history_R']['times'],
-                                              results['balance_history_R']['values'])
-        rebalancing_counts.append(len(events_L) + len(events_R))
-    
-    ax3.bar(policies, rebalancing_counts)
+    ax3.bar(policies, df['rebalancing_count'])
     ax3.set_title('Number of Rebalancing Operations by Policy')
     ax3.set_ylabel('Count')
     
     # 4. Transaction Success vs Failure by Policy
     ax4 = plt.subplot(2, 2, 4)
-    success_counts = []
-    failure_counts = []
-    for policy in policies:
-        results = all_results[policy]
-        success = (results['success_count_L_to_R'] + results['success_count_R_to_L'])
-        failure = (results['failure_count_L_to_R'] + results['failure_count_R_to_L'])
-        success_counts.append(success)
-        failure_counts.append(failure)
-    
     x = np.arange(len(policies))
     width = 0.35
     ax4.bar(x - width/2, success_counts, width, label='Success')
@@ -130,17 +118,17 @@ def plot_comparison_metrics(all_results):
     ax4.legend()
     
     plt.tight_layout()
-    plt.savefig('../outputs/results/policy_comparison.png', bbox_inches='tight')
+    # Only the saved figure needs the high resolution
+    plt.savefig('../outputs/results/policy_comparison.png', dpi=300, bbox_inches='tight')
     plt.close()
 
     # Print summary statistics
     print("\nPolicy Comparison Summary:")
     for policy in policies:
-        results = all_results[policy]
         print(f"\n{policy}:")
-        print(f"Success Rate: {results['success_rate_node_total']*100:.2f}%")
-        print(f"Total Transactions: {results['success_count_L_to_R'] + results['success_count_R_to_L'] + results['failure_count_L_to_R'] + results['failure_count_R_to_L']:.0f}")
-        print(f"Total Amount: {results['success_amount_L_to_R'] + results['success_amount_R_to_L']:.0f}")
+        print(f"Success Rate: {df.at[policy, 'success_rate_node_total']*100:.2f}%")
+        print(f"Total Transactions: {success_counts[policy] + failure_counts[policy]:.0f}")
+        print(f"Total Amount: {success_amounts[policy]:.0f}")
 
 if __name__ == '__main__':
     # Define paths for different policies
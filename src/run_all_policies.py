@@ -1,19 +1,22 @@
 import subprocess
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Interpreter for the simulation runs, e.g. SIMULATION_PYTHON=pypy3 to run SimPy under a JIT
+PYTHON = os.environ.get("SIMULATION_PYTHON", sys.executable)
 
 def run_simulation(policy, duration=100):
     """Run simulation for a specific policy"""
     print(f"\nRunning simulation for {policy} policy...")
-    cmd = f"python simulation_driver_new.py --rebalancing_policy {policy} --simulation_duration {duration}"
+    # Each policy writes its own results file, so the runs can overlap
+    output_file = f"results_{policy.lower()}"
+    cmd = [PYTHON, "simulation_driver_new.py", "--rebalancing_policy", policy,
+           "--simulation_duration", str(duration), "--output_file", output_file]
     
-    # Rename the output file to match the policy
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    result = subprocess.run(cmd, capture_output=True, text=True)
     if result.returncode == 0:
-        old_file = "../outputs/results/results_test.hdf5"
-        new_file = f"../outputs/results/results_{policy.lower()}.hdf5"
-        if os.path.exists(old_file):
-            os.rename(old_file, new_file)
-            print(f"Successfully saved results to {new_file}")
+        print(f"Successfully saved results to ../outputs/results/{output_file}.hdf5")
     else:
         print(f"Error running simulation for {policy}:")
         print(result.stderr)
@@ -24,8 +27,9 @@ def main():
     
     # Run simulations for all policies
     policies = ['none', 'autoloop', 'loopmax', 'debal']
-    for policy in policies:
-        run_simulation(policy)
+    # The simulations are independent child processes, so run them side by side
+    with ThreadPoolExecutor(max_workers=len(policies)) as executor:
+        list(executor.map(run_simulation, policies))
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from numpy import random, round
+import itertools
 import simpy
 import sys
 import pandas as pd
@@ -6,46 +6,82 @@ import numpy as np
 
 from entities.node import Node
 from entities.transaction import Transaction
+from src.entities import _kernels  # the kernel module Node calls into
 
 
-def transaction_generator(env, topology, source, destination, total_transactions, exp_mean, amount_distribution, amount_distribution_parameters, all_transactions_list, verbose, verbose_also_print_transactions):
-    time_to_next_arrival = random.exponential(1.0 / exp_mean)
-    yield env.timeout(time_to_next_arrival)
-
-    for _ in range(total_transactions):
-        if amount_distribution == "constant":
-            amount = amount_distribution_parameters[0]
-        elif amount_distribution == "uniform":
-            max_transaction_amount = amount_distribution_parameters[0]
-            amount = random.randint(1, max_transaction_amount)
-            # amount = random.uniform(0.0, float(max_transaction_amount))
-        elif amount_distribution == "gaussian":
-            max_transaction_amount = amount_distribution_parameters[0]
-            gaussian_mean = amount_distribution_parameters[1]
-            gaussian_variance = amount_distribution_parameters[2]
-            amount = round(max(1, min(max_transaction_amount, random.normal(gaussian_mean, gaussian_variance))))
-            # amount = max(0.00001, min(float(max_transaction_amount), random.normal(gaussian_mean, gaussian_variance)))
-        # elif amount_distribution == "pareto":
-        #     lower = amount_distribution_parameters[0]  # the lower end of the support
-        #     shape = amount_distribution_parameters[1]  # the distribution shape parameter, also known as `a` or `alpha`
-        #     size = amount_distribution_parameters[2]  # the size of your sample (number of random values)
-        #     amount = random.pareto(shape, size) + lower
-        # elif amount_distribution == "powerlaw":
-        #     powerlaw.Power_Law(xmin=1, xmax=2, discrete=True, parameters=[1.16]).generate_random(n=10)
-        # elif amount_distribution == "empirical_from_csv_file":
-        #     dataset = amount_distribution_parameters[0]
-        #     data_size = amount_distribution_parameters[1]
-        #     amount = dataset[random.randint(0, data_size)]
-        else:
-            print("Input error: {} is not a supported amount distribution or the parameters {} given are invalid.".format(amount_distribution, amount_distribution_parameters))
-            sys.exit(1)
+_STATUS_CODES = {"SUCCEEDED": 0, "FAILED": 1, "PENDING": 2}
+
+
+class _TransactionRecords:
+    """Arrival time, amount, direction and status of every generated transaction, one array per field"""
+    __slots__ = ('time_of_arrival', 'amount', 'direction', 'status', 'count')
+
+    def __init__(self, capacity):
+        self.time_of_arrival = np.empty(capacity)
+        self.amount = np.empty(capacity, dtype=np.float32)  # whole amounts, exact below 2**24
+        self.direction = np.empty(capacity, dtype=np.int8)  # 0 is L->R, 1 is R->L
+        self.status = np.empty(capacity, dtype=np.int8)
+        self.count = 0
+
+    def add(self, t):
+        i = self.count
+        self.time_of_arrival[i] = t.time_of_arrival
+        self.amount[i] = t.amount
+        self.direction[i] = t.direction
+        self.status[i] = _STATUS_CODES[t.status]
+        self.count = i + 1
+
+
+def _rand_stream(draw, size=4096):
+    """Yield values from a NumPy sampler called on batches of the given size"""
+    while True:
+        yield from draw(size).tolist()
+
 
+def transaction_generator(env, rng, topology, source, destination, total_transactions, exp_mean, amount_distribution, amount_distribution_parameters, transaction_records, verbose, verbose_also_print_transactions):
+    # Random draws are taken in batches, and the distribution is chosen once
+    inter_arrival_times = _rand_stream(lambda size: rng.exponential(1.0 / exp_mean, size))
+    if amount_distribution == "constant":
+        amounts = itertools.repeat(amount_distribution_parameters[0])
+    elif amount_distribution == "uniform":
+        max_transaction_amount = amount_distribution_parameters[0]
+        amounts = _rand_stream(lambda size: rng.integers(1, max_transaction_amount, size))
+        # amount = random.uniform(0.0, float(max_transaction_amount))
+    elif amount_distribution == "gaussian":
+        max_transaction_amount = amount_distribution_parameters[0]
+        gaussian_mean = amount_distribution_parameters[1]
+        gaussian_variance = amount_distribution_parameters[2]
+        amounts = _rand_stream(lambda size: np.round(np.clip(rng.normal(gaussian_mean, gaussian_variance, size), 1, max_transaction_amount)))
+        # amount = max(0.00001, min(float(max_transaction_amount), random.normal(gaussian_mean, gaussian_variance)))
+    # elif amount_distribution == "pareto":
+    #     lower = amount_distribution_parameters[0]  # the lower end of the support
+    #     shape = amount_distribution_parameters[1]  # the distribution shape parameter, also known as `a` or `alpha`
+    #     size = amount_distribution_parameters[2]  # the size of your sample (number of random values)
+    #     amount = random.pareto(shape, size) + lower
+    # elif amount_distribution == "powerlaw":
+    #     powerlaw.Power_Law(xmin=1, xmax=2, discrete=True, parameters=[1.16]).generate_random(n=10)
+    # elif amount_distribution == "empirical_from_csv_file":
+    #     dataset = amount_distribution_parameters[0]
+    #     data_size = amount_distribution_parameters[1]
+    #     amount = dataset[random.randint(0, data_size)]
+    else:
+        print("Input error: {} is not a supported amount distribution or the parameters {} given are invalid.".format(amount_distribution, amount_distribution_parameters))
+        sys.exit(1)
+
+    # Bound methods looked up once for the loop
+    next_inter_arrival_time = inter_arrival_times.__next__
+    timeout = env.timeout
+    record_transaction = transaction_records.add
+
+    yield timeout(next_inter_arrival_time())
+
+    for amount in itertools.islice(amounts, total_transactions):
         t = Transaction(env, topology, env.now, source, destination, amount, verbose, verbose_also_print_transactions)
-        all_transactions_list.append(t)
-        env.process(t.run())
+        # The payment settles instantly, so it runs inline rather than as its own process
+        t.execute()
+        record_transaction(t)
 
-        time_to_next_arrival = random.exponential(1.0 / exp_mean)
-        yield env.timeout(time_to_next_arrival)
+        yield timeout(next_inter_arrival_time())
 
 
 def simulate_relay_node(node_parameters, experiment_parameters, rebalancing_parameters):
@@ -57,18 +93,24 @@ def simulate_relay_node(node_parameters, experiment_parameters, rebalancing_para
     N.add_channel("R", node_parameters["initial_balance_R"], node_parameters["capacity_R"] - node_parameters["initial_balance_R"], node_parameters["capacity_R"])
     
     # Set fee rates
-    N.fee_rates["L"] = node_parameters["proportional_fee"]
-    N.fee_rates["R"] = node_parameters["proportional_fee"]
+    N.set_fee_rate("L", node_parameters["proportional_fee"])
+    N.set_fee_rate("R", node_parameters["proportional_fee"])
 
     # Create environment and start simulation
     env = simpy.Environment()
     N.env = env  # Add environment reference to node for time tracking
     topology = {"N": N}
 
-    all_transactions_list = []
+    transaction_records = _TransactionRecords(experiment_parameters["total_transactions_L_to_R"] + experiment_parameters["total_transactions_R_to_L"])
+
+    # Independent random streams for the two transaction generators, reproducible when a seed is given
+    rng_L_to_R, rng_R_to_L = (np.random.default_rng(s) for s in np.random.SeedSequence(experiment_parameters.get("seed")).spawn(2))
     
     # Add rebalancing check process for DEBAL
     if rebalancing_parameters["rebalancing_policy"].lower() == "debal":
+        # Compile the decision kernels now rather than at the first check
+        _kernels.warm_up()
+
         def rebalancing_check():
             while env.now < experiment_parameters["simulation_duration"]:
                 yield env.timeout(rebalancing_parameters["check_interval"])
@@ -82,23 +124,23 @@ def simulate_relay_node(node_parameters, experiment_parameters, rebalancing_para
 
     # Add transaction generators
     env.process(transaction_generator(
-        env, topology, "L", "R",
+        env, rng_L_to_R, topology, "L", "R",
         experiment_parameters["total_transactions_L_to_R"],
         experiment_parameters["exp_mean_L_to_R"],
         experiment_parameters["amount_distribution_L_to_R"],
         experiment_parameters["amount_distribution_parameters_L_to_R"],
-        all_transactions_list,
+        transaction_records,
         experiment_parameters["verbose"],
         experiment_parameters["verbose_also_print_transactions"]
     ))
     
     env.process(transaction_generator(
-        env, topology, "R", "L",
+        env, rng_R_to_L, topology, "R", "L",
         experiment_parameters["total_transactions_R_to_L"],
         experiment_parameters["exp_mean_R_to_L"],
         experiment_parameters["amount_distribution_R_to_L"],
         experiment_parameters["amount_distribution_parameters_R_to_L"],
-        all_transactions_list,
+        transaction_records,
         experiment_parameters["verbose"],
         experiment_parameters["verbose_also_print_transactions"]
     ))
@@ -109,24 +151,39 @@ def simulate_relay_node(node_parameters, experiment_parameters, rebalancing_para
     # Calculate results
     measurement_interval = [0, env.now]
 
-    success_count_L_to_R = sum(1 for t in all_transactions_list if ((t.time_of_arrival >= measurement_interval[0]) and (t.time_of_arrival < measurement_interval[1]) and (t.source == "L") and (t.destination == "R") and (t.status == "SUCCEEDED")))
-    success_count_R_to_L = sum(1 for t in all_transactions_list if ((t.time_of_arrival >= measurement_interval[0]) and (t.time_of_arrival < measurement_interval[1]) and (t.source == "R") and (t.destination == "L") and (t.status == "SUCCEEDED")))
+    # Count and sum the amounts of the arrived transactions per direction and status in one pass,
+    # binning on a combined (direction, status) code instead of building a mask per aggregate
+    n = transaction_records.count
+    time_of_arrival = transaction_records.time_of_arrival[:n]
+    in_interval = (time_of_arrival >= measurement_interval[0]) & (time_of_arrival < measurement_interval[1])
+    codes = (transaction_records.direction[:n][in_interval] * len(_STATUS_CODES) +
+             transaction_records.status[:n][in_interval])
+    amounts = transaction_records.amount[:n][in_interval].astype(np.float64)
+    counts = np.bincount(codes, minlength=2 * len(_STATUS_CODES))
+    sums = np.bincount(codes, weights=amounts, minlength=2 * len(_STATUS_CODES))
+
+    def total(source, destination, status_name, column):
+        code = (0 if source == "L" else 1) * len(_STATUS_CODES) + _STATUS_CODES[status_name]
+        return int(counts[code]) if column == 'count' else float(sums[code])
+
+    success_count_L_to_R = total("L", "R", "SUCCEEDED", 'count')
+    success_count_R_to_L = total("R", "L", "SUCCEEDED", 'count')
     success_count_node_total = success_count_L_to_R + success_count_R_to_L
 
-    failure_count_L_to_R = sum(1 for t in all_transactions_list if ((t.time_of_arrival >= measurement_interval[0]) and (t.time_of_arrival < measurement_interval[1]) and (t.source == "L") and (t.destination == "R") and (t.status == "FAILED")))
-    failure_count_R_to_L = sum(1 for t in all_transactions_list if ((t.time_of_arrival >= measurement_interval[0]) and (t.time_of_arrival < measurement_interval[1]) and (t.source == "R") and (t.destination == "L") and (t.status == "FAILED")))
+    failure_count_L_to_R = total("L", "R", "FAILED", 'count')
+    failure_count_R_to_L = total("R", "L", "FAILED", 'count')
     failure_count_node_total = failure_count_L_to_R + failure_count_R_to_L
 
     arrived_count_L_to_R = success_count_L_to_R + failure_count_L_to_R
     arrived_count_R_to_L = success_count_R_to_L + failure_count_R_to_L
     arrived_count_node_total = arrived_count_L_to_R + arrived_count_R_to_L
 
-    success_amount_L_to_R = sum(t.amount for t in all_transactions_list if ((t.time_of_arrival >= measurement_interval[0]) and (t.time_of_arrival < measurement_interval[1]) and (t.source == "L") and (t.destination == "R") and (t.status == "SUCCEEDED")))
-    success_amount_R_to_L = sum(t.amount for t in all_transactions_list if ((t.time_of_arrival >= measurement_interval[0]) and (t.time_of_arrival < measurement_interval[1]) and (t.source == "R") and (t.destination == "L") and (t.status == "SUCCEEDED")))
+    success_amount_L_to_R = total("L", "R", "SUCCEEDED", 'sum')
+    success_amount_R_to_L = total("R", "L", "SUCCEEDED", 'sum')
     success_amount_node_total = success_amount_L_to_R + success_amount_R_to_L
 
-    failure_amount_L_to_R = sum(t.amount for t in all_transactions_list if ((t.time_of_arrival >= measurement_interval[0]) and (t.time_of_arrival < measurement_interval[1]) and (t.source == "L") and (t.destination == "R") and (t.status == "FAILED")))
-    failure_amount_R_to_L = sum(t.amount for t in all_transactions_list if ((t.time_of_arrival >= measurement_interval[0]) and (t.time_of_arrival < measurement_interval[1]) and (t.source == "R") and (t.destination == "L") and (t.status == "FAILED")))
+    failure_amount_L_to_R = total("L", "R", "FAILED", 'sum')
+    failure_amount_R_to_L = total("R", "L", "FAILED", 'sum')
     failure_amount_node_total = failure_amount_L_to_R + failure_amount_R_to_L
 
     arrived_amount_L_to_R = success_amount_L_to_R + failure_amount_L_to_R
@@ -147,12 +204,12 @@ def simulate_relay_node(node_parameters, experiment_parameters, rebalancing_para
     # Extract balance history
     balance_history = N.get_balance_history()
     # Flatten times and values for plotting compatibility
-    balance_history_times_L = np.array([t for t, _, _ in balance_history["L"]])
-    balance_history_times_R = np.array([t for t, _, _ in balance_history["R"]])
-    balance_history_values_L = np.array([local for _, local, _ in balance_history["L"]])
-    balance_history_values_R = np.array([local for _, local, _ in balance_history["R"]])
-    remote_balance_history_values_L = np.array([remote for _, _, remote in balance_history["L"]])
-    remote_balance_history_values_R = np.array([remote for _, _, remote in balance_history["R"]])
+    balance_history_times_L = balance_history["L"][:, 0]
+    balance_history_times_R = balance_history["R"][:, 0]
+    balance_history_values_L = balance_history["L"][:, 1]
+    balance_history_values_R = balance_history["R"][:, 1]
+    remote_balance_history_values_L = balance_history["L"][:, 2]
+    remote_balance_history_values_R = balance_history["R"][:, 2]
 
     # Synchronize time points for both channels
     if len(balance_history_times_L) == len(balance_history_times_R) and np.allclose(balance_history_times_L, balance_history_times_R):
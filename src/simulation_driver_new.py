@@ -7,6 +7,7 @@ def parse_args():
     parser.add_argument('--network_size', type=int, default=100, help='Size of the network')
     parser.add_argument('--simulation_duration', type=int, default=1000, help='Duration of the simulation')
     parser.add_argument('--rebalancing_policy', type=str, default='debal', choices=['none', 'autoloop', 'loopmax', 'debal'], help='Rebalancing policy to use')
+    parser.add_argument('--output_file', type=str, default='results_test', help='Name of the results file, without the .hdf5 extension')
     return parser.parse_args()
 
 def pypet_wrapper(traj):
@@ -66,7 +67,7 @@ def main():
     args = parse_args()
     
     # SIMULATION PARAMETERS
-    filename = 'results_test'
+    filename = args.output_file
     verbose = True  # Enable verbose output
     verbose_also_print_transactions = True  # Enable transaction output
     num_of_experiments = 1
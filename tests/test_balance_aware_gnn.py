@@ -111,5 +111,74 @@ class TestBalanceAwareGNN(unittest.TestCase):
         scores = [score for score, _ in ranked_paths]
         self.assertEqual(scores, sorted(scores, reverse=True))
         
+class TestCandidatePaths(unittest.TestCase):
+    def setUp(self):
+        self.gnn = BalanceAwareGNN()
+        # Large enough to take the compiled search when numba is installed
+        self.graph = nx.gnm_random_graph(100, 400, seed=1)
+        
+    def test_matches_networkx(self):
+        """Test candidate paths match networkx, in the same order."""
+        for cutoff in (2, 3, 4):
+            expected = list(nx.all_simple_paths(self.graph, 1, 9, cutoff=cutoff))
+            self.assertEqual(self.gnn.find_candidate_paths(self.graph, 1, 9, cutoff), expected)
+            
+    def test_small_graph_matches_networkx(self):
+        """Test the two-sided search used on small graphs matches networkx."""
+        for graph in (nx.gnm_random_graph(20, 60, seed=2),
+                      nx.gnm_random_graph(20, 80, seed=3, directed=True)):
+            for cutoff in (1, 2, 3, 4):
+                expected = list(nx.all_simple_paths(graph, 0, 7, cutoff=cutoff))
+                self.assertEqual(self.gnn.find_candidate_paths(graph, 0, 7, cutoff), expected)
+                
+    def test_buffer_growth(self):
+        """Test the path buffer grows when more paths are found than it holds."""
+        self.gnn._path_buf_rows = 2
+        expected = list(nx.all_simple_paths(self.graph, 1, 9, cutoff=4))
+        self.assertGreater(len(expected), 2)
+        self.assertEqual(self.gnn.find_candidate_paths(self.graph, 1, 9, 4), expected)
+        
+class TestPartialUpdate(unittest.TestCase):
+    def test_dirty_node_without_dirty_edges(self):
+        """Test a changed node is re-embedded even when none of its edges changed."""
+        gnn = BalanceAwareGNN()
+        edge_index = [[0, 1], [1, 0], [1, 2], [2, 1]]
+        edge_features = [[1000.0, 400.0, 600.0], [1000.0, 600.0, 400.0],
+                         [1000.0, 500.0, 500.0], [1000.0, 500.0, 500.0]]
+        node_features = [[0.4, 0.6], [0.55, 0.45], [0.5, 0.5], [0.5, 0.5]]
+        gnn.update_state(node_features, edge_index, edge_features)
+        
+        # Node 3 has no edges in the graph, e.g. only channels to unmanaged peers
+        node_features[3] = [0.8, 0.2]
+        gnn.update_state(node_features, edge_index, edge_features, dirty_edges=[], dirty_nodes=[3])
+        partial = gnn.node_embeddings.clone()
+        gnn.update_state(node_features, edge_index, edge_features)
+        self.assertTrue(torch.allclose(partial, gnn.node_embeddings, atol=1e-6))
+        
+class TestRankPaths(unittest.TestCase):
+    def setUp(self):
+        self.gnn = BalanceAwareGNN()
+        self.graph = nx.Graph([(0, 1), (1, 2), (2, 3), (0, 3), (1, 3)])
+        self.edge_index = [[u, v] for u, v in self.graph.edges] + [[v, u] for u, v in self.graph.edges]
+        self.node_features = [[0.7, 0.3], [0.5, 0.5], [0.4, 0.6], [0.5, 0.5]]
+        self.edge_features = [[1000.0, 400.0 + 50 * i, 600.0 - 50 * i] for i in range(len(self.edge_index))]
+        
+    def test_named_nodes_match_indices(self):
+        """Test ranking by node names gives the ranking by embedding rows."""
+        self.gnn.update_state(self.node_features, self.edge_index, self.edge_features)
+        expected = self.gnn.rank_paths(self.graph, 0, 2, self.gnn.node_embeddings,
+                                       self.gnn.constraint_scores, self.gnn.edge_index)
+        self.assertGreater(len(expected), 0)
+        
+        names = ["a", "b", "c", "d"]
+        self.gnn.update_state(self.node_features, self.edge_index, self.edge_features, node_names=names)
+        named = nx.relabel_nodes(self.graph, dict(enumerate(names)))
+        ranked = self.gnn.rank_paths(named, "a", "c", self.gnn.node_embeddings,
+                                     self.gnn.constraint_scores, self.gnn.edge_index)
+        self.assertEqual([path for _, path in ranked],
+                         [[names[i] for i in path] for _, path in expected])
+        self.assertEqual([score for score, _ in ranked], [score for score, _ in expected])
+        
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
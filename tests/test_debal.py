@@ -32,6 +32,14 @@ class TestDEBAL(unittest.TestCase):
         self.assertEqual(self.node.capacities[1], 1000)
         self.assertEqual(self.node.fee_rates[1], 0.001)
         
+    def test_fee_rates_read_only(self):
+        self.node.set_fee_rate(1, 0.001)
+        self.assertEqual(self.node.fee_rates[1], 0.001)
+        with self.assertRaises(TypeError):
+            self.node.fee_rates[1] = 0.002
+        self.node.set_fee_rate(1, 0.002)
+        self.assertEqual(self.node.fee_rates[1], 0.002)
+        
     def test_get_state(self):
         self.node.add_channel(1, 1000, 500, 500, 0.001)
         state = self.node.get_state()
@@ -1,7 +1,9 @@
 """Tests for the DEBAL integration module."""
 
 import unittest
+from unittest import mock
 import simpy
+import torch
 import networkx as nx
 from src.entities.node import Node
 from src.entities.debal_integration import DEBALManager
@@ -143,11 +145,108 @@ class TestDEBALIntegration(unittest.TestCase):
         self.nodes[0].update_balances("node_1", 100, -100)
         
         # Update GNN state
-        self.debal._update_gnn_state()
+        self.assertTrue(self.debal._gnn_dirty)
+        self.debal._recompute_gnn()
+        self.assertFalse(self.debal._gnn_dirty)
         
         # Verify GNN state update
         self.assertNotEqual(initial_embeddings, self.debal.gnn.node_embeddings)
         
+    def test_gnn_update_skips_idle_ticks(self):
+        """Test that the periodic GNN update only recomputes after balance changes."""
+        with mock.patch.object(self.debal, '_recompute_gnn', wraps=self.debal._recompute_gnn) as recompute:
+            self.env.process(self.debal._update_gnn_state())
+            self.env.run(until=150)
+            self.assertEqual(recompute.call_count, 1)
+            
+            self.nodes[0].update_balances("node_1", 100, -100)
+            self.env.run(until=210)
+            self.assertEqual(recompute.call_count, 2)
+            
+    def test_gnn_partial_update_matches_full(self):
+        """Test that refreshing only changed nodes gives the full recompute's state."""
+        self.debal._recompute_gnn()
+        self.nodes[0].update_balances("node_1", 100, -100)
+        self.assertEqual(self.debal._dirty_nodes, {0})
+        self.debal._recompute_gnn()
+        embeddings = self.debal.gnn.node_embeddings.clone()
+        scores = self.debal.gnn.constraint_scores.clone()
+        
+        self.debal._mark_gnn_dirty()
+        self.debal._recompute_gnn()
+        self.assertTrue(torch.equal(scores, self.debal.gnn.constraint_scores))
+        # Embedding a subset of rows may round differently in float32
+        self.assertTrue(torch.allclose(embeddings, self.debal.gnn.node_embeddings, atol=1e-6))
+        
+    def test_channels_to_unmanaged_peers(self):
+        """Test that channels to peers outside the manager stay out of the GNN graph."""
+        self.nodes[3].add_channel("L", 500, 500, 1000)
+        # A node whose only channel goes to an unmanaged peer
+        relay = Node("node_4")
+        relay.add_channel("R", 500, 500, 1000)
+        debal = DEBALManager(self.env, self.nodes + [relay], self.network_graph)
+        self.assertEqual(len(debal._local), 8)
+        self.assertEqual(len(debal._gnn_edge_index), 6)
+        
+        debal._recompute_gnn()
+        self.nodes[3].update_balances("L", 100, -100)
+        relay.update_balances("R", 300, -300)
+        debal._recompute_gnn()
+        scores = debal.gnn.constraint_scores.clone()
+        embeddings = debal.gnn.node_embeddings.clone()
+        debal._mark_gnn_dirty()
+        debal._recompute_gnn()
+        self.assertTrue(torch.equal(scores, debal.gnn.constraint_scores))
+        self.assertTrue(torch.allclose(embeddings, debal.gnn.node_embeddings, atol=1e-6))
+        
+    def test_shared_channel_arrays(self):
+        """Test that node balance updates land in the manager's channel table."""
+        self.assertEqual(len(self.debal._local), 6)
+        self.nodes[0].update_balances("node_1", 100, -100)
+        self.assertEqual(self.debal._local[0], 700)
+        self.assertEqual(self.debal._remote[0], 300)
+        
+        # Adding a channel detaches the node until the table is rebuilt
+        self.nodes[3].add_channel("node_0", 500, 500, 1000)
+        self.assertFalse(self.debal._soa_current())
+        self.debal._build_soa()
+        self.assertTrue(self.debal._soa_current())
+        self.assertEqual(len(self.debal._local), 7)
+        
+    def test_feasible_paths(self):
+        """Test that vectorized path filtering agrees with validate_path."""
+        paths = [
+            ["node_0", "node_1"],
+            ["node_0", "node_1", "node_2"],
+            ["node_1", "node_2", "node_3"],
+            ["node_0", "node_2"],  # No such channel
+            ["node_3", "node_2", "node_1", "node_0"]
+        ]
+        for amount in (10, 100, 200):
+            expected = [p for p in paths if self.debal.rebalancing_engine.validate_path(p, amount)]
+            self.assertEqual(self.debal._feasible_paths(paths, amount), expected)
+            
+    def test_table_eligibility(self):
+        """Test that bulk eligibility over the channel table matches per-node checks."""
+        election = self.debal.leader_election
+        for node in self.nodes:
+            node.rebalancing_requested = True
+        for kappa, theta in ((0.5, 0.2), (0.6, 0.0), (0.9, 0.9)):
+            election.set_thresholds(kappa, theta)
+            expected = [node for node in self.nodes if election._check_channels(node)]
+            self.assertEqual(election._eligible_from_table(self.nodes), expected)
+            
+    def test_network_state_snapshot(self):
+        """Test that unchanged nodes reuse their cached state entry."""
+        first = self.debal.get_network_state()["node_states"]
+        self.nodes[0].update_balances("node_1", -100, 100)
+        second = self.debal.get_network_state()["node_states"]
+        
+        self.assertIsNot(first["node_0"], second["node_0"])
+        self.assertIs(first["node_3"], second["node_3"])
+        self.assertEqual(first["node_0"]["local_balances"]["node_1"] - 100,
+                         second["node_0"]["local_balances"]["node_1"])
+        
     def test_scheduler_operation(self):
         """Test scheduler operation."""
         # Start scheduler
@@ -85,6 +85,20 @@ class TestLeaderElection(unittest.TestCase):
         # Node 5 should be eligible
         self.assertTrue(self.election.is_eligible_leader(self.nodes[4]))
         
+    def test_eligibility_cache(self):
+        """Test that cached eligibility follows balance changes."""
+        node = self.nodes[0]
+        self.assertTrue(self.election.is_eligible_leader(node))
+        version = node.balance_version
+        self.assertTrue(self.election.is_eligible_leader(node))
+        self.assertEqual(node.balance_version, version)
+        
+        # Move both channels to a balanced state below kappa
+        node.update_balances("ch1", -350, 350)
+        node.update_balances("ch2", -250, 250)
+        self.assertNotEqual(node.balance_version, version)
+        self.assertFalse(self.election.is_eligible_leader(node))
+        
     def test_leader_election(self):
         """Test the leader election process."""
         # Elect initial leader
@@ -103,6 +117,42 @@ class TestLeaderElection(unittest.TestCase):
         self.assertIsNotNone(new_leader)
         self.assertTrue(self.election.is_eligible_leader(new_leader))
         
+    def test_registered_nodes(self):
+        """Test request tracking and id lookup for registered nodes."""
+        election = LeaderElection(kappa=0.5, theta=0.2, delta_t=3600.0, nodes=self.nodes)
+        self.assertEqual(set(election._requesting),
+                         {self.nodes[0], self.nodes[1], self.nodes[2], self.nodes[4]})
+        
+        # Clearing requests removes nodes from the candidates
+        for node in self.nodes[:3]:
+            node.clear_rebalancing_request()
+        self.nodes[4].rebalancing_requested = False
+        leader, _ = election.elect_leader(self.nodes, 1000.0)
+        self.assertIsNone(leader)
+        
+        self.nodes[4].request_rebalancing()
+        leader, _ = election.elect_leader(self.nodes, 1000.0)
+        self.assertIs(leader, self.nodes[4])
+        
+        # Announcements are verified through the id lookup
+        announcement = election.announce_leader(leader, 1000.0)
+        self.assertTrue(election.verify_announcement(announcement, []))
+        
+    def test_elections_share_nodes(self):
+        """Test that two elections over the same nodes both track requests."""
+        first = LeaderElection(kappa=0.5, theta=0.2, delta_t=3600.0, nodes=self.nodes)
+        second = LeaderElection(kappa=0.5, theta=0.2, delta_t=3600.0, nodes=self.nodes)
+        self.nodes[0].clear_rebalancing_request()
+        self.assertNotIn(self.nodes[0], first._requesting)
+        self.assertNotIn(self.nodes[0], second._requesting)
+        
+        # Re-registering replaces the election's own listener only
+        first.register_nodes(self.nodes[1:])
+        self.assertEqual(self.nodes[0]._request_listeners, [second._on_request_change])
+        self.nodes[0].request_rebalancing()
+        self.assertNotIn(self.nodes[0], first._requesting)
+        self.assertIn(self.nodes[0], second._requesting)
+        
     def test_announcement_verification(self):
         """Test leader announcement and verification."""
         # Get a valid leader
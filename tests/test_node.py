@@ -1,7 +1,7 @@
 """Tests for the Node class."""
 
 import unittest
-from src.entities.node import Node
+from src.entities.node import Node, BalanceHistory
 
 class TestNode(unittest.TestCase):
     def setUp(self):
@@ -62,6 +62,11 @@ class TestNode(unittest.TestCase):
         incoming = self.node.get_total_incoming_liquidity()
         self.assertEqual(incoming, 2000)  # 500 + 700 + 800
         
+        # Totals follow balance updates
+        self.node.update_balances("node1", -100, 100)
+        self.assertEqual(self.node.get_total_outgoing_liquidity(), 900)
+        self.assertEqual(self.node.get_total_incoming_liquidity(), 2100)
+        
     def test_rebalancing_request(self):
         """Test rebalancing request handling."""
         # Initially not requesting
@@ -105,6 +110,61 @@ class TestNode(unittest.TestCase):
         self.assertNotIn("node4", self.node.remote_balances)
         self.assertNotIn("node4", self.node.capacities)
         
+    def test_channel_arrays(self):
+        """Test that the per-channel arrays track the balance dicts."""
+        # Arrays are built lazily from the assigned dicts, in channel order
+        self.assertEqual(self.node.local_arr.tolist(), [500, 300, 200])
+        self.assertEqual(self.node.cap_arr.tolist(), [1000, 1000, 1000])
+        
+        # Balance updates are mirrored into the arrays
+        self.node.update_balances("node2", 100, -100)
+        self.assertEqual(self.node.local_arr.tolist(), [500, 400, 200])
+        self.assertEqual(self.node.remote_arr.tolist(), [500, 600, 800])
+        
+        # Topology changes resize the arrays
+        self.node.add_channel("node4", 400, 600, 1000)
+        self.assertEqual(len(self.node.local_arr), 4)
+        self.node.remove_channel("node4")
+        self.assertEqual(len(self.node.local_arr), 3)
+        
+    def test_skewness_array(self):
+        """Test that the cached skewness array follows balance updates."""
+        skewness = self.node.skewness_arr
+        expected = [self.node.get_channel_skewness(c) for c in self.node.channel_ids]
+        self.assertEqual(skewness.tolist(), expected)
+        self.assertIs(self.node.skewness_arr, skewness)
+        
+        self.node.update_balances("node2", 100, -100)
+        self.assertAlmostEqual(self.node.skewness_arr[1], 0.2)
+        
+    def test_balance_history(self):
+        """Test growing and ring-buffer balance histories."""
+        self.node.add_channel("node4", 400, 600, 1000)
+        for _ in range(100):
+            self.node.update_balances("node4", 1, -1)
+        history = self.node.get_balance_history("node4")
+        self.assertEqual(history.shape, (101, 3))
+        self.assertEqual(history[-1].tolist(), [100, 500, 500])
+        
+        # A ring buffer keeps only the most recent records, in order
+        ring = BalanceHistory(capacity=4)
+        for t in range(10):
+            ring.append(t, t, -t)
+        self.assertEqual(len(ring), 4)
+        self.assertEqual(ring.to_array()[:, 0].tolist(), [6, 7, 8, 9])
+        self.assertEqual(ring.next_time(), 10)
+        
+    def test_perform_rebalancing_clamp(self):
+        """Test that rebalancing keeps balances within the channel capacity."""
+        self.node.add_channel("node4", 100, 500, 1000)
+        self.node.perform_rebalancing("node4", -300)
+        self.assertEqual(self.node.local_balances["node4"], 0)
+        self.assertEqual(self.node.remote_balances["node4"], 800)
+        
+        self.node.perform_rebalancing("node4", 1200)
+        self.assertEqual(self.node.local_balances["node4"], 1000)
+        self.assertEqual(self.node.remote_balances["node4"], 0)
+        
     def test_leader_state(self):
         """Test leader state management."""
         # Set leader
@@ -113,5 +113,64 @@ class TestRebalancingEngine(unittest.TestCase):
         improvement = self.engine.calculate_improvement(path, 800)
         self.assertEqual(improvement, 0)
         
+class TestCommitTransfer(unittest.TestCase):
+    def setUp(self):
+        self.engine = RebalancingEngine(sigma=0.2)
+        self.nodes = [Node(f"node_{i}") for i in range(3)]
+        self.nodes[0].add_channel("node_1", 700, 300, 1000)
+        self.nodes[1].add_channel("node_0", 300, 700, 1000)
+        self.nodes[1].add_channel("node_2", 650, 350, 1000)
+        self.nodes[2].add_channel("node_1", 350, 650, 1000)
+        self.engine.nodes = {node.id: node for node in self.nodes}
+        
+    def test_matches_improvement_and_execution(self):
+        """Test that a single-amount transfer matches calculate_improvement + execute_transfer"""
+        path = ["node_0", "node_1", "node_2"]
+        expected = self.engine.calculate_improvement(path, 100)
+        self.assertGreater(expected, 0)
+        
+        amount, improvement = self.engine.try_transfer_multi(path, [100])
+        self.assertEqual(amount, 100)
+        self.assertAlmostEqual(improvement, expected)
+        self.assertEqual(self.nodes[0].local_balances["node_1"], 600)
+        self.assertEqual(self.nodes[1].local_balances["node_0"], 400)
+        self.assertEqual(self.nodes[1].local_balances["node_2"], 550)
+        
+    def test_infeasible_transfer_leaves_balances(self):
+        """Test that an infeasible transfer moves nothing"""
+        path = ["node_0", "node_1", "node_2"]
+        self.assertEqual(self.engine.try_transfer_multi(path, [500]), (0.0, 0.0))
+        self.assertEqual(self.nodes[0].local_balances["node_1"], 700)
+        self.assertEqual(self.nodes[1].local_balances["node_2"], 650)
+        
+    def test_multi_amount_transfer(self):
+        """Test that the first accepted amount is executed"""
+        path = ["node_0", "node_1", "node_2"]
+        amounts = [1000, 500, 100, 50]
+        expected = self.engine.calculate_improvement(path, 100)
+        
+        amount, improvement = self.engine.try_transfer_multi(path, amounts)
+        self.assertEqual(amount, 100)
+        self.assertAlmostEqual(improvement, expected)
+        self.assertEqual(self.nodes[0].local_balances["node_1"], 600)
+        
+        self.assertEqual(self.engine.try_transfer_multi(path, [1000, 500]), (0.0, 0.0))
+        
+    def test_commit_needs_both_channel_ends(self):
+        """Test that a hop without its mirrored channel fails before any balance moves"""
+        self.nodes[2].remove_channel("node_1")
+        self.assertFalse(self.engine.commit_transfer(["node_0", "node_1", "node_2"], 100))
+        self.assertEqual(self.nodes[0].local_balances["node_1"], 700)
+        self.assertEqual(self.nodes[1].local_balances["node_2"], 650)
+        
+    def test_rejected_update_is_rolled_back(self):
+        """Test that a rejected balance update undoes the rest of the transfer"""
+        self.nodes[2].update_balances("node_1", 0, -600)  # node_2 cannot pay 100 back to node_1
+        self.assertFalse(self.engine.commit_transfer(["node_0", "node_1", "node_2"], 100))
+        self.assertEqual(self.nodes[0].local_balances["node_1"], 700)
+        self.assertEqual(self.nodes[1].local_balances["node_0"], 300)
+        self.assertEqual(self.nodes[1].local_balances["node_2"], 650)
+        self.assertEqual(self.nodes[2].remote_balances["node_1"], 50)
+        
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
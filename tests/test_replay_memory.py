@@ -0,0 +1,49 @@
+"""Tests for the SAC replay memory."""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.learning.pytorch_soft_actor_critic import ReplayMemory
+
+class TestReplayMemory(unittest.TestCase):
+    def setUp(self):
+        """Set up a small memory filled past its capacity."""
+        self.memory = ReplayMemory(5)
+        for i in range(7):
+            self.memory.push(np.full(4, i), [i * 0.1], float(i), np.full(4, i + 1), 1.0)
+            
+    def test_ring_buffer_overwrites_oldest(self):
+        """Test the oldest transitions are overwritten once capacity is reached."""
+        self.assertEqual(len(self.memory), 5)
+        self.assertEqual(sorted(self.memory.r.tolist()), [2.0, 3.0, 4.0, 5.0, 6.0])
+        
+    def test_sample_shapes(self):
+        """Test sampled batches have one row per transition."""
+        states, actions, rewards, next_states, dones = self.memory.sample(3)
+        self.assertEqual(tuple(states.shape), (3, 4))
+        self.assertEqual(tuple(actions.shape), (3, 1))
+        self.assertEqual(tuple(rewards.shape), (3, 1))
+        self.assertEqual(tuple(next_states.shape), (3, 4))
+        self.assertEqual(tuple(dones.shape), (3, 1))
+        # Each sampled next state follows its state
+        self.assertTrue(((next_states - states) == 1).all())
+        
+    def test_save_and_load(self):
+        """Test a saved buffer loads back oldest transition first."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'buffer')
+            self.memory.save_buffer('test', save_path=path)
+            loaded = ReplayMemory(5)
+            loaded.load_buffer(path)
+        self.assertEqual(len(loaded), 5)
+        self.assertEqual(loaded.r.tolist(), [2.0, 3.0, 4.0, 5.0, 6.0])
+        self.assertEqual(loaded.pos, 0)
+        
+    def test_sample_larger_than_memory(self):
+        """Test sampling more transitions than stored raises."""
+        with self.assertRaises(ValueError):
+            ReplayMemory(10).sample(1)
+            
+if __name__ == '__main__':
+    unittest.main()